@@ -0,0 +1,203 @@
+"""
+Columnar in-memory copy of the permits for the dashboard aggregates.
+
+After each import every permit is loaded once into numpy arrays: applicant names, neighborhoods and zipcodes
+are dictionary encoded (integer codes into a list of distinct values), amounts are float64 and start dates
+datetime64. Aggregations are then vectorized group-bys over the codes (bincount, lexsort) and take
+milliseconds, instead of GROUP BY queries over approved_permits joined to addresses on every request.
+Rebuilt by the first request after each import, so cached dashboard responses never carry pre-import numbers.
+
+The API imports this module on the first dashboard request, so pandas and numpy aren't loaded at startup.
+"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from api.caching import VersionedCache
+from database import Address, ApprovedPermit, get_session
+
+DISTRIBUTION_QUANTILES = (0.25, 0.5, 0.75, 0.9)
+
+
+def _encode(values):
+    """Dictionary encode `values`: (codes, distinct values), with code -1 for missing values."""
+    codes, uniques = pd.factorize(pd.Series(values, dtype="object"), use_na_sentinel=True)
+    return codes.astype("int32"), [str(value) for value in uniques]
+
+
+class PermitColumns:
+    def __init__(self, contractor_names, contractor_ids, amounts, dates, neighborhoods, zipcodes):
+        """
+        Parallel sequences per permit. `dates` are "YYYY-MM-DD HH:MM:SS" strings as stored in approved_permits;
+        contractor ids, amounts, dates, neighborhoods and zipcodes may be None.
+        """
+        self.contractor_codes, self.contractor_names = _encode(contractor_names)
+        self.neighborhood_codes, self.neighborhoods = _encode(neighborhoods)
+        self.zipcode_codes, self.zipcodes = _encode(zipcodes)
+        self.amounts = pd.to_numeric(pd.Series(amounts, dtype="object"), errors="coerce").to_numpy(dtype=np.float64)
+        self.dates = pd.to_datetime(
+            pd.Series(dates, dtype="object"), format="%Y-%m-%d %H:%M:%S", errors="coerce"
+        ).to_numpy(dtype="datetime64[s]")
+        years = self.dates.astype("datetime64[Y]").astype(np.int64) + 1970
+        self.years = np.where(np.isnat(self.dates), -1, years).astype(np.int32)
+
+        # Each applicant name is linked to at most one licensed contractor
+        contractor_ids = np.array([-1 if cid is None else cid for cid in contractor_ids], dtype=np.int64)
+        self.contractor_id_by_name = np.full(len(self.contractor_names), -1, dtype=np.int64)
+        linked = (contractor_ids >= 0) & (self.contractor_codes >= 0)
+        self.contractor_id_by_name[self.contractor_codes[linked]] = contractor_ids[linked]
+        self._name_codes = {name: code for code, name in enumerate(self.contractor_names)}
+
+        # Each distribution grouping pre-sorted by group and then amount; filtering keeps the order
+        self._amount_order = {
+            "zipcode": np.lexsort((self.amounts, self.zipcode_codes)),
+            "neighborhood": np.lexsort((self.amounts, self.neighborhood_codes)),
+        }
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def _mask(self, year=None, zipcode=None, neighborhood=None):
+        """Boolean mask of the permits matching every given filter."""
+        mask = None
+        for codes, values, wanted in ((self.zipcode_codes, self.zipcodes, zipcode),
+                                      (self.neighborhood_codes, self.neighborhoods, neighborhood)):
+            if wanted is None:
+                continue
+            code = values.index(wanted) if wanted in values else -2
+            mask = (codes == code) if mask is None else mask & (codes == code)
+        if year is not None:
+            mask = (self.years == year) if mask is None else mask & (self.years == year)
+        return mask if mask is not None else np.ones(len(self), dtype=bool)
+
+    def _contractor_totals(self, mask):
+        """Per contractor code: permit count, summed amount and last start date over the masked permits."""
+        codes = self.contractor_codes[mask]
+        amounts = self.amounts[mask]
+        dates = self.dates[mask]
+        named = codes >= 0
+        codes, amounts, dates = codes[named], amounts[named], dates[named]
+        size = len(self.contractor_names)
+        counts = np.bincount(codes, minlength=size)
+        totals = np.bincount(codes, weights=np.nan_to_num(amounts), minlength=size)
+        # NaT is the smallest int64, so an unbuffered maximum over the integer views skips undated permits
+        last = np.full(size, np.datetime64("NaT"), dtype="datetime64[s]")
+        np.maximum.at(last.view(np.int64), codes, dates.view(np.int64))
+        return counts, totals, last
+
+    def _contractor(self, code, **values):
+        contractor_id = int(self.contractor_id_by_name[code])
+        return {
+            "contractor_name": self.contractor_names[code],
+            "contractor_id": contractor_id if contractor_id >= 0 else None,
+            **values,
+        }
+
+    def top_contractors(self, by="permits", limit=20, year=None, zipcode=None, neighborhood=None):
+        """Applicants with the most permits (or the largest total amount), optionally in one year/zipcode/neighborhood."""
+        counts, totals, last = self._contractor_totals(self._mask(year, zipcode, neighborhood))
+        primary, secondary = (counts, totals) if by == "permits" else (totals, counts)
+        active = np.flatnonzero(counts)
+        top = active[np.lexsort((-secondary[active], -primary[active]))[:limit]]
+        return [
+            self._contractor(
+                code, permits=int(counts[code]), total_amount=round(float(totals[code]), 2),
+                last_permit=None if np.isnat(last[code]) else str(last[code]).replace("T", " "),
+            )
+            for code in top
+        ]
+
+    def contractor_years(self, contractor_name=None, limit=10):
+        """
+        Permits and total amount per year for one applicant, or for the `limit` applicants with the most
+        permits when no name is given. Permits without a start date are left out.
+        """
+        if contractor_name is not None:
+            code = self._name_codes.get(contractor_name)
+            codes = np.array([] if code is None else [code], dtype=np.int64)
+        else:
+            counts = np.bincount(self.contractor_codes[self.contractor_codes >= 0], minlength=len(self.contractor_names))
+            codes = np.argsort(-counts, kind="stable")[:limit]
+            codes = codes[counts[codes] > 0]
+        if not len(codes):
+            return []
+
+        # Position of each permit's contractor among `codes`, -1 for everyone else
+        position = np.full(len(self.contractor_names) + 1, -1, dtype=np.int64)
+        position[codes] = np.arange(len(codes))
+        rows = position[self.contractor_codes]  # code -1 indexes the spare last slot
+        selected = (rows >= 0) & (self.years >= 0)
+        rows, years, amounts = rows[selected], self.years[selected], self.amounts[selected]
+        if not len(years):
+            return [self._contractor(code, years=[]) for code in codes]
+
+        first_year = int(years.min())
+        span = int(years.max()) - first_year + 1
+        keys = rows * span + (years - first_year)
+        counts = np.bincount(keys, minlength=len(codes) * span).reshape(len(codes), span)
+        totals = np.bincount(keys, weights=np.nan_to_num(amounts), minlength=len(codes) * span).reshape(len(codes), span)
+        return [
+            self._contractor(code, years=[
+                {"year": first_year + int(offset), "permits": int(counts[row, offset]),
+                 "total_amount": round(float(totals[row, offset]), 2)}
+                for offset in np.flatnonzero(counts[row])
+            ])
+            for row, code in enumerate(codes)
+        ]
+
+    def value_distribution(self, group_by="zipcode", year=None):
+        """
+        Permit amount statistics per zipcode or neighborhood: count, total, mean, min, max and quantiles.
+        Permits without an amount are left out. Groups are ordered by total amount, largest first.
+        """
+        codes, values = ((self.zipcode_codes, self.zipcodes) if group_by == "zipcode"
+                         else (self.neighborhood_codes, self.neighborhoods))
+        valid = self._mask(year=year) & (codes >= 0) & ~np.isnan(self.amounts)
+        # Sorted by group, then amount, so every group is one ascending run and quantiles are index arithmetic
+        order = self._amount_order[group_by]
+        order = order[valid[order]]
+        codes, amounts = codes[order], self.amounts[order]
+        if not len(codes):
+            return []
+
+        counts = np.bincount(codes, minlength=len(values))
+        totals = np.bincount(codes, weights=amounts, minlength=len(values))
+        starts = np.cumsum(counts) - counts
+        groups = np.flatnonzero(counts)
+        counts, totals, starts = counts[groups], totals[groups], starts[groups]
+
+        quantiles = {}
+        for q in DISTRIBUTION_QUANTILES:
+            # Linear interpolation between the closest ranks, like numpy.quantile's default
+            position = starts + q * (counts - 1)
+            low = np.floor(position).astype(np.int64)
+            high = np.ceil(position).astype(np.int64)
+            quantiles[q] = amounts[low] + (amounts[high] - amounts[low]) * (position - low)
+
+        return [
+            {
+                group_by: values[group],
+                "permits": int(counts[i]),
+                "total_amount": round(float(totals[i]), 2),
+                "mean_amount": round(float(totals[i] / counts[i]), 2),
+                "min_amount": float(amounts[starts[i]]),
+                **{f"p{round(q * 100)}_amount": round(float(quantiles[q][i]), 2) for q in DISTRIBUTION_QUANTILES},
+                "max_amount": float(amounts[starts[i] + counts[i] - 1]),
+            }
+            for i, group in sorted(enumerate(groups), key=lambda item: -totals[item[0]])
+        ]
+
+
+def build_permit_columns():
+    with get_session() as session:
+        rows = session.execute(
+            select(ApprovedPermit.contractor_name, ApprovedPermit.contractor_id, ApprovedPermit.project_amount,
+                   ApprovedPermit.date_started, Address.city, Address.zipcode)
+            .outerjoin(Address, ApprovedPermit.project_address_id == Address.id)
+        ).all()
+    if not rows:
+        return PermitColumns([], [], [], [], [], [])
+    return PermitColumns(*zip(*rows))
+
+
+permit_columns = VersionedCache("permit analytics columns", build_permit_columns)
@@ -0,0 +1,75 @@
+"""
+In-memory type-ahead index for short contractor queries.
+
+Every word of every contractor name and company is indexed under its first 1..AUTOCOMPLETE_MAX_PREFIX
+characters, and each prefix keeps only its best AUTOCOMPLETE_RESULTS names, ranked by permit count and
+then by most recent permit. A lookup is a single dict access. The index is rebuilt whenever the data
+version changes, i.e. after each import.
+"""
+import os
+import re
+
+from sqlalchemy import func, select
+
+from api.caching import VersionedCache
+from database import ApprovedPermit, Contractor, get_session
+
+AUTOCOMPLETE_MAX_PREFIX = int(os.getenv("AUTOCOMPLETE_MAX_PREFIX", 4))
+AUTOCOMPLETE_RESULTS = int(os.getenv("AUTOCOMPLETE_RESULTS", 10))
+
+_NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_prefix(text):
+    """Lowercase and collapse punctuation/whitespace to single spaces, as the index keys are."""
+    return " ".join(_NON_ALPHANUMERIC.sub(" ", (text or "").lower()).split())
+
+
+class PrefixIndex:
+    def __init__(self, entries, max_prefix=AUTOCOMPLETE_MAX_PREFIX, limit=AUTOCOMPLETE_RESULTS):
+        """
+        `entries` are (name, searchable texts, rank) with larger ranks first, e.g.
+        ("john sullivan", ["john sullivan", "sullivan roofing llc"], (permit_count, last_permit)).
+        """
+        self.max_prefix = max_prefix
+        self.limit = limit
+        self._top = {}  # prefix -> names, best first
+        for name, texts, _ in sorted(entries, key=lambda entry: entry[2], reverse=True):
+            prefixes = set()
+            for text in texts:
+                words = normalize_prefix(text).split(" ")
+                for start in range(len(words)):
+                    # Prefixes of the text from each word on, so "sul" finds "john sullivan" and "o br" "o brien"
+                    tail = " ".join(words[start:])
+                    prefixes.update(tail[:length] for length in range(1, min(len(tail), max_prefix) + 1))
+            for prefix in prefixes:
+                names = self._top.setdefault(prefix, [])
+                if len(names) < limit and name not in names:
+                    names.append(name)
+
+    def __len__(self):
+        return len(self._top)
+
+    def search(self, query, limit=None):
+        """Best names with a word starting with `query`. Only queries up to max_prefix characters are indexed."""
+        return self._top.get(normalize_prefix(query), [])[:limit or self.limit]
+
+
+def build_contractor_index():
+    with get_session() as session:
+        activity = {
+            contractor_id: (permit_count, last_permit or "")
+            for contractor_id, permit_count, last_permit in session.execute(
+                select(ApprovedPermit.contractor_id, func.count(), func.max(ApprovedPermit.date_started))
+                .where(ApprovedPermit.contractor_id.is_not(None))
+                .group_by(ApprovedPermit.contractor_id)
+            )
+        }
+        entries = [
+            (name, [name, company] if company else [name], activity.get(contractor_id, (0, "")))
+            for contractor_id, name, company in session.execute(select(Contractor.id, Contractor.name, Contractor.company))
+        ]
+    return PrefixIndex(entries)
+
+
+contractor_index = VersionedCache("contractor prefix index", build_contractor_index)
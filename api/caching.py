@@ -0,0 +1,203 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+import database
+
+# How often each worker re-reads the State timestamps; bounds how stale a response can be after an import
+DATA_VERSION_TTL_SECONDS = float(os.getenv("DATA_VERSION_TTL_SECONDS", 5))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 4096))
+# Browsers and CDNs may reuse a response this long before revalidating with the ETag
+RESPONSE_MAX_AGE_SECONDS = int(os.getenv("RESPONSE_MAX_AGE_SECONDS", 60))
+
+_version_lock = threading.Lock()
+_data_version = None
+_data_version_checked_at = 0.0
+
+
+def current_data_version():
+    """The import timestamps from State, re-read at most every DATA_VERSION_TTL_SECONDS."""
+    global _data_version, _data_version_checked_at
+    now = time.monotonic()
+    if _data_version is not None and now - _data_version_checked_at < DATA_VERSION_TTL_SECONDS:
+        return _data_version
+    with _version_lock:
+        if _data_version is None or now - _data_version_checked_at >= DATA_VERSION_TTL_SECONDS:
+            _data_version = database.get_data_version()
+            _data_version_checked_at = now
+    return _data_version
+
+
+def _last_modified(version):
+    latest = max(version)
+    if latest == datetime.datetime.min:
+        return None  # Nothing imported yet
+    return latest.replace(microsecond=0, tzinfo=datetime.timezone.utc)
+
+
+class ResponseCache:
+    """
+    Caches JSON responses per path and query string for as long as the data version is unchanged.
+    Responses carry a weak ETag and Last-Modified derived from the version, so conditional
+    requests from browsers and CDNs get a 304 without touching the database.
+
+        cached = response_cache.lookup(request)
+        if cached is not None:
+            return cached
+        ...
+        return response_cache.store(request, payload)
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> body bytes
+        self._version = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(request):
+        return request.url.path, tuple(sorted(request.query_params.multi_items()))
+
+    def _headers(self, request):
+        version = request.state.cache_version
+        digest = hashlib.sha1(repr((version, self._key(request))).encode()).hexdigest()[:20]
+        headers = {
+            "ETag": f'W/"{digest}"',
+            "Cache-Control": f"public, max-age={RESPONSE_MAX_AGE_SECONDS}",
+        }
+        last_modified = _last_modified(version)
+        if last_modified is not None:
+            headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+        return headers
+
+    @staticmethod
+    def _not_modified(request, headers):
+        """
+        Whether the request's validators match the representation described by `headers`. Only called once
+        that representation exists, so errors (404, 400) are never turned into a 304.
+        """
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            # Weak comparison, as with any W/ validator
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or headers["ETag"].removeprefix("W/") in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and "Last-Modified" in headers:
+            try:
+                return parsedate_to_datetime(headers["Last-Modified"]) <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def lookup(self, request: Request):
+        """Return a 304 or cached response for `request`, or None if the endpoint has to compute it."""
+        version = current_data_version()
+        request.state.cache_version = version
+        headers = self._headers(request)
+        with self._lock:
+            if version != self._version:
+                # An import finished since these were computed
+                self._entries.clear()
+                self._version = version
+            body = self._entries.get(self._key(request))
+            if body is not None:
+                self._entries.move_to_end(self._key(request))
+        # Without a cached body the endpoint may still reject the request or not find the resource, so
+        # conditional headers are only checked by `store`, after it succeeded
+        if body is None:
+            return None
+        if self._not_modified(request, headers):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def store(self, request: Request, payload):
+        """Encode `payload` as JSON, cache it under the version seen by `lookup` and return the response."""
+        body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+        with self._lock:
+            if request.state.cache_version == self._version:
+                self._entries[self._key(request)] = body
+                self._entries.move_to_end(self._key(request))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        headers = self._headers(request)
+        if self._not_modified(request, headers):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache()
+
+
+class VersionedCache:
+    """
+    An in-memory structure derived from the imported data (e.g. a search index), rebuilt when the data version
+    changes. Both accessors only return a value built for the requested version, so responses cached under
+    that version's ETag never carry pre-import data: `get` builds it synchronously (concurrent callers wait
+    for the one build), `current` returns None and rebuilds in a background thread.
+    """
+
+    def __init__(self, name, build):
+        self.name = name
+        self.build = build
+        self._value = None
+        self._version = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()  # One build at a time, shared by `get` and background rebuilds
+        self._refresh_thread = None
+
+    def _fresh(self, version):
+        # The version is read first: builds assign the value before the version
+        built_for = self._version
+        value = self._value
+        return value if value is not None and built_for == version else None
+
+    def _build_for(self, version):
+        with self._build_lock:
+            value = self._fresh(version)
+            if value is not None:
+                return value  # Built by another caller while this one waited
+            started = time.perf_counter()
+            value = self.build()
+            with self._lock:
+                self._value, self._version = value, version
+        print(f"Rebuilt {self.name} in {time.perf_counter() - started:.2f}s")
+        return value
+
+    def _rebuild(self, version):
+        try:
+            self._build_for(version)
+        except Exception as e:
+            print(f"Failed to rebuild {self.name}: {e}")
+
+    def _refresh_in_background(self, version):
+        with self._lock:
+            if self._refresh_thread is None or not self._refresh_thread.is_alive():
+                self._refresh_thread = threading.Thread(
+                    target=self._rebuild, args=(version,), name=f"rebuild-{self.name}", daemon=True
+                )
+                self._refresh_thread.start()
+
+    def get(self, version):
+        """The value built for `version`, building it first if needed."""
+        value = self._fresh(version)
+        if value is not None:
+            return value
+        return self._build_for(version)
+
+    def current(self, version):
+        """
+        The value built for `version`, or None while it's (re)built in the background, like
+        database.snapshot.get_snapshot: callers then answer from the tables and don't cache the response.
+        """
+        value = self._fresh(version)
+        if value is None:
+            self._refresh_in_background(version)
+        return value
@@ -1,7 +1,9 @@
 from rapidfuzz import fuzz
 from database import get_session, Contractor, ApprovedPermit, Address
-from fastapi import APIRouter, HTTPException
-from sqlalchemy import and_
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_
+import asyncio
 from sqlalchemy import distinct
 import os
 from sqlalchemy.orm import Session
@@ -12,16 +14,38 @@ from pydantic import BaseModel
 import database
 import json
 from sqlalchemy.orm import class_mapper
-from openai import OpenAI
 from typing import List, Optional
 from sqlalchemy import func
+from api.autocomplete import contractor_index
+from api.caching import response_cache
+from api.prompt_builder import build_contractor_prompt
+from api.llm_gateway import llm_gateway
+from database.snapshot import CONTRACTOR_COLUMNS, get_snapshot
 
 class FuzzyContractor(BaseModel):
     name: str
     score: int
 
 router = APIRouter()
-client = OpenAI()
+
+# Upper bound on contractors per batch request, and on GPT verdicts running at once for one request
+MAX_BATCH_CONTRACTORS = int(os.getenv("MAX_BATCH_CONTRACTORS", 20))
+BATCH_GPT_CONCURRENCY = int(os.getenv("BATCH_GPT_CONCURRENCY", 4))
+# Contractors listed by /nearby-permits
+NEARBY_CONTRACTORS = int(os.getenv("NEARBY_CONTRACTORS", 20))
+# Orderings of /analytics/top-contractors and groupings of /analytics/value-distribution
+TOP_CONTRACTORS_ORDER = ("permits", "amount")
+DISTRIBUTION_GROUPS = ("zipcode", "neighborhood")
+
+
+async def get_permit_columns(request: Request):
+    """
+    The analytics columns for this request's data version. api.analytics (pandas, numpy) is imported on the
+    first dashboard request, and builds run in the threadpool so a rebuild after an import doesn't stall the
+    event loop.
+    """
+    from api.analytics import permit_columns
+    return await run_in_threadpool(permit_columns.get, request.state.cache_version)
 
 @router.get(
     "/fuzzy-contractor",
@@ -33,81 +57,362 @@ client = OpenAI()
         "Otherwise, a simple case-insensitive search is performed. Only the first 10 results are returned."
     ),
 )
-async def search_contractor(contractor_name: Optional[str] = None, fuzz_ratio: Optional[int] = 75) -> List[FuzzyContractor]:
+async def search_contractor(request: Request, contractor_name: Optional[str] = None, fuzz_ratio: Optional[int] = 75) -> List[FuzzyContractor]:
     """
     Search for a contractor's name using fuzzy search.
     - If 'contractor_name' is provided and its length > 4, uses fuzzy_search_contractors.
     - fuzz_ratio is a number between 0-100. 100 means only return exact results.
     Only the first 10 results are returned.
     """
+    cached = response_cache.lookup(request)
+    if cached is not None:
+        return cached
 
+    snapshot = get_snapshot(request.state.cache_version)
     if len(contractor_name) > 4:
         # Use fuzzy search if the input length is more than 4 characters
         # fuzzy_search_contractors should return a list of tuples: (Contractor, score)
-        results = fuzzy_search_contractors(contractor_name, fuzz_ratio)
+        results = fuzzy_search_contractors(contractor_name, fuzz_ratio, snapshot)
         limited_results = results[:10]
-        return [
+        return response_cache.store(request, [
             {
                 "name": contractor,
                 "score": score
             }
             for contractor, score in limited_results
-        ]
+        ])
     else:
-        # For short queries, fallback to a simple ilike search
-        with get_session() as session:
-            contractors = session.query(Contractor).filter(
-                Contractor.name.ilike(f"%{contractor_name}%")
-            ).limit(10).all()
-            return [
-                {
-                    "name": contractor.name.title(),
-                    "score": 0
-                }
-                for contractor in contractors
-            ]
+        # For short queries, type-ahead on word prefixes, busiest contractors first
+        index = contractor_index.current(request.state.cache_version)
+        if index is None:
+            # The index is being rebuilt after an import: a simple ilike search meanwhile, not cached, so
+            # this version's ETag only ever serves index results
+            with get_session() as session:
+                contractors = session.query(Contractor).filter(
+                    Contractor.name.ilike(f"%{contractor_name}%")
+                ).limit(10).all()
+                return [
+                    {
+                        "name": contractor.name.title(),
+                        "score": 0
+                    }
+                    for contractor in contractors
+                ]
+        return response_cache.store(request, [
+            {
+                "name": name.title(),
+                "score": 0
+            }
+            for name in index.search(contractor_name)
+        ])
 
     raise HTTPException(status_code=400, detail="Must provide either contractor_name or license_id")
 
 
 
 @router.get("/detailed-contractor")
-async def detailed_contractor(contractor_name: str = None, license_id: str = None):
-    with get_session() as session:
-        # Build the query based on provided parameters
-        query = session.query(Contractor)
+async def detailed_contractor(request: Request, contractor_name: str = None, license_id: str = None):
+    cached = response_cache.lookup(request)
+    if cached is not None:
+        return cached
+
+    if not license_id and not contractor_name:
+        raise HTTPException(status_code=400, detail="Either contractor_name or license_id must be provided")
+
+    snapshot = get_snapshot(request.state.cache_version)
+    if snapshot is not None:
+        # Served from the local read-only snapshot, isolated from running imports
         if license_id:
-            contractor = query.filter_by(license_id=license_id.lower()).first()
-        elif contractor_name:
-            contractor = query.filter_by(name=contractor_name.lower()).first()
+            contractor = snapshot.find_contractor(license_id=license_id.lower())
         else:
-            raise HTTPException(status_code=400, detail="Either contractor_name or license_id must be provided")
-
+            contractor = snapshot.find_contractor(name=contractor_name.lower())
         if not contractor:
             raise HTTPException(status_code=404, detail="Contractor not found")
+        contractor_details = contractor
+        previous_works = snapshot.permits_for_contractor(contractor["id"], contractor["name"])
+        total_amount = snapshot.total_amount(contractor["id"], contractor["name"])
+    else:
+        with get_session() as session:
+            # Build the query based on provided parameters
+            query = session.query(Contractor)
+            if license_id:
+                contractor = query.filter_by(license_id=license_id.lower()).first()
+            else:
+                contractor = query.filter_by(name=contractor_name.lower()).first()
+
+            if not contractor:
+                raise HTTPException(status_code=404, detail="Contractor not found")
+
+            contractor_details = {column: getattr(contractor, column) for column in CONTRACTOR_COLUMNS}
+
+            # Retrieve previous works from ApprovedPermit table, linked by contractor id after each import
+            previous_works = get_previous_works(session, ApprovedPermit.contractor_id == contractor.id)
+            total_amount = get_total_project_amount_for_contractor(contractor.id)
+            if not previous_works:
+                # Permits imported before the first linking pass only carry the applicant name
+                previous_works = get_previous_works(session, ApprovedPermit.contractor_name == contractor.name)
+                total_amount = get_total_project_amount_for_contractor(contractor.id, contractor.name)
+
+    gpt_result = await gpt_search(build_contractor_prompt(previous_works, total_amount, contractor_details))
+
+    # Prepare the response
+    return response_cache.store(request, {
+        "previous_works": previous_works,
+        "total_amount": total_amount,
+        "gpt": gpt_result
+    })
+
+@router.get("/detailed-contractors")
+async def detailed_contractors(
+    request: Request,
+    license_id: List[str] = Query(default=[]),
+    contractor_name: List[str] = Query(default=[]),
+    gpt: bool = False,
+):
+    """
+    Batch version of /detailed-contractor for side by side comparisons, e.g.
+    `?license_id=123&license_id=456&contractor_name=john smith&gpt=true`.
+    All contractors are resolved with a constant number of IN (...) and grouped queries, and with
+    gpt=true the verdicts are requested concurrently. Contractors that don't exist are listed in `not_found`.
+    """
+    cached = response_cache.lookup(request)
+    if cached is not None:
+        return cached
+
+    license_ids = list(dict.fromkeys(value.lower() for value in license_id))
+    names = list(dict.fromkeys(value.lower() for value in contractor_name))
+    if not license_ids and not names:
+        raise HTTPException(status_code=400, detail="Either contractor_name or license_id must be provided")
+    if len(license_ids) + len(names) > MAX_BATCH_CONTRACTORS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_CONTRACTORS} contractors per request")
+
+    snapshot = get_snapshot(request.state.cache_version)
+    if snapshot is not None:
+        contractors = snapshot.find_contractors(license_ids, names)
+        previous_works = snapshot.permits_for_contractors(contractors)
+        total_amounts = snapshot.total_amounts(contractors)
+    else:
+        contractors, previous_works, total_amounts = get_contractor_details(license_ids, names)
+
+    # License ids first, then names, each in request order; the first (lowest id) contractor wins, as in /detailed-contractor
+    by_license, by_name = {}, {}
+    for contractor in contractors:
+        by_license.setdefault(contractor["license_id"], contractor)
+        by_name.setdefault(contractor["name"], contractor)
+    requested = [("license_id", value, by_license.get(value)) for value in license_ids]
+    requested += [("contractor_name", value, by_name.get(value)) for value in names]
+
+    results, not_found, seen = [], [], set()
+    for key, value, contractor in requested:
+        if contractor is None:
+            not_found.append({key: value})
+        elif contractor["id"] not in seen:
+            seen.add(contractor["id"])
+            results.append({
+                "contractor": contractor,
+                "previous_works": previous_works[contractor["id"]],
+                "total_amount": total_amounts[contractor["id"]],
+            })
+
+    failed = 0
+    if gpt:
+        semaphore = asyncio.Semaphore(BATCH_GPT_CONCURRENCY)
+
+        async def verdict(result):
+            nonlocal failed
+            prompt = build_contractor_prompt(result["previous_works"], result["total_amount"], result["contractor"])
+            try:
+                async with semaphore:
+                    result["gpt"] = await gpt_search(prompt)
+            except Exception as e:
+                # One timeout or OpenAI error only costs that contractor's verdict, not the whole batch
+                print(f"GPT verdict failed for contractor {result['contractor']['id']}: {e}")
+                failed += 1
+                result["gpt"] = None
+                result["gpt_error"] = "The verdict could not be generated, try again later"
 
-        # Retrieve previous works from ApprovedPermit table
-        previous_works = (
-            session.query(ApprovedPermit)
-            .join(Address, ApprovedPermit.project_address_id == Address.id)
-            .filter(ApprovedPermit.contractor_name == contractor.name)
-            .all()
-        )
-
-        total_amount = get_total_project_amount_for_contractor(contractor_name)
-        # TODO: include gpt response
-
-        contractor_info = f"'previous_works': {serialize_query_result(previous_works)},\n 'total_amount': {total_amount}"
-        gpt_result = gpt_search("{" + contractor_info + "}")
-
-        # Prepare the response
-        response = {
-            "previous_works": previous_works,
-            "total_amount": total_amount,
-            "gpt": gpt_result
+        await asyncio.gather(*(verdict(result) for result in results))
+
+    payload = {"contractors": results, "not_found": not_found}
+    if failed:
+        return payload  # Not cached, so a retry asks again for the missing verdicts
+    return response_cache.store(request, payload)
+
+@router.get("/nearby-permits")
+async def nearby_permits(
+    request: Request,
+    latitude: float = Query(ge=-90, le=90),
+    longitude: float = Query(ge=-180, le=180),
+    radius_m: float = Query(default=500, gt=0),
+    limit: int = Query(default=50, ge=1, le=200),
+):
+    """
+    Permits within `radius_m` meters of a point, nearest first (at most `limit`), and the licensed contractors
+    who pulled the most permits in that circle. Served from the in-memory grid index plus two primary key lookups.
+    """
+    cached = response_cache.lookup(request)
+    if cached is not None:
+        return cached
+    from api import geo  # Loads numpy, so only on the first nearby search rather than at startup
+    if radius_m > geo.GEO_MAX_RADIUS_METERS:
+        raise HTTPException(status_code=400, detail=f"radius_m must be at most {geo.GEO_MAX_RADIUS_METERS:g}")
+
+    # Built for this request's data version before answering, as the response is cached under its ETag;
+    # right after an import that's a rebuild, so it runs in the threadpool to keep the event loop serving
+    grid = await run_in_threadpool(geo.permit_grid.get, request.state.cache_version)
+    positions, distances = grid.within(latitude, longitude, radius_m)
+    nearest = grid.nearest_project_ids(positions, distances, limit)
+    contractor_stats = grid.top_contractors(positions, distances, NEARBY_CONTRACTORS)
+
+    with get_session() as session:
+        permits = []
+        for permit, address in session.query(ApprovedPermit, Address).join(
+            Address, ApprovedPermit.project_address_id == Address.id
+        ).filter(ApprovedPermit.project_id.in_(list(nearest))).all():
+            permits.append({
+                **model_to_dict(permit),
+                "address": {key: getattr(address, key) for key in ("street_number", "street_name", "city", "zipcode", "latitude", "longitude")},
+                "distance_m": nearest[permit.project_id],
+            })
+        contractors = [
+            {**{column: getattr(contractor, column) for column in CONTRACTOR_COLUMNS}, **contractor_stats[contractor.id]}
+            for contractor in session.query(Contractor).filter(Contractor.id.in_(list(contractor_stats))).all()
+        ]
+
+    permits.sort(key=lambda permit: (permit["distance_m"], permit["project_id"]))
+    contractors.sort(key=lambda contractor: (-contractor["permits_nearby"], contractor["nearest_m"]))
+    return response_cache.store(request, {
+        "permits_within_radius": len(positions),
+        "permits": permits,
+        "contractors": contractors,
+    })
+
+@router.get("/search-work")
+async def search_work(request: Request, q: str, limit: int = Query(default=20, ge=1, le=100)):
+    """
+    Full-text search over permit descriptions and comments, e.g. `?q=roof replacement`. Returns licensed
+    contractors ranked by how many of their permits match every word, then by total relevance.
+    """
+    cached = response_cache.lookup(request)
+    if cached is not None:
+        return cached
+
+    ranked = database.search_contractors_by_work(q, limit)
+    with get_session() as session:
+        contractors = {
+            contractor.id: {column: getattr(contractor, column) for column in CONTRACTOR_COLUMNS}
+            for contractor in session.query(Contractor).filter(
+                Contractor.id.in_([row["contractor_id"] for row in ranked])
+            ).all()
         }
+    return response_cache.store(request, {
+        "query": q,
+        "contractors": [
+            {
+                **contractors[row["contractor_id"]],
+                "matching_permits": row["matching_permits"],
+                "matching_amount": row["matching_amount"],
+                "last_matching_permit": row["last_matching_permit"],
+                "relevance": round(float(row["relevance"] or 0), 3),
+            }
+            for row in ranked if row["contractor_id"] in contractors
+        ],
+    })
 
-    return response
+@router.get("/analytics/top-contractors")
+async def analytics_top_contractors(
+    request: Request,
+    by: str = Query(default="permits", pattern=f"^({'|'.join(TOP_CONTRACTORS_ORDER)})$"),
+    year: Optional[int] = None,
+    zipcode: Optional[str] = None,
+    neighborhood: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=200),
+):
+    """Permit applicants with the most permits (`by=permits`) or the largest total amount (`by=amount`)."""
+    cached = response_cache.lookup(request)
+    if cached is not None:
+        return cached
+
+    columns = await get_permit_columns(request)
+    return response_cache.store(request, {
+        "by": by,
+        "contractors": columns.top_contractors(
+            by, limit, year=year, zipcode=zipcode and zipcode.strip().lower(),
+            neighborhood=neighborhood and neighborhood.strip().lower(),
+        ),
+    })
+
+@router.get("/analytics/contractor-years")
+async def analytics_contractor_years(
+    request: Request, contractor_name: Optional[str] = None, limit: int = Query(default=10, ge=1, le=100)
+):
+    """Permits and total amount per year for one applicant, or for the `limit` busiest applicants."""
+    cached = response_cache.lookup(request)
+    if cached is not None:
+        return cached
+
+    columns = await get_permit_columns(request)
+    name = contractor_name.strip().lower() if contractor_name else None
+    contractors = columns.contractor_years(name, limit)
+    if name is not None and not contractors:
+        raise HTTPException(status_code=404, detail="No permits found for this contractor")
+    return response_cache.store(request, {"contractors": contractors})
+
+@router.get("/analytics/value-distribution")
+async def analytics_value_distribution(
+    request: Request,
+    group_by: str = Query(default="zipcode", pattern=f"^({'|'.join(DISTRIBUTION_GROUPS)})$"),
+    year: Optional[int] = None,
+):
+    """Permit amount statistics (count, total, mean, quartiles, p90) per zipcode or neighborhood."""
+    cached = response_cache.lookup(request)
+    if cached is not None:
+        return cached
+
+    columns = await get_permit_columns(request)
+    return response_cache.store(request, {
+        "group_by": group_by,
+        "groups": columns.value_distribution(group_by, year=year),
+    })
+
+def get_contractor_details(license_ids, names):
+    """
+    Load contractors and their permit history and totals with at most five queries, whatever the batch size.
+    Returns (contractors, {contractor id: previous works}, {contractor id: total amount}).
+    """
+    with get_session() as session:
+        contractors = [
+            {column: getattr(contractor, column) for column in CONTRACTOR_COLUMNS}
+            for contractor in session.query(Contractor).filter(
+                or_(Contractor.license_id.in_(license_ids), Contractor.name.in_(names))
+            ).order_by(Contractor.id).all()
+        ]
+        if not contractors:
+            return [], {}, {}
+
+        ids = [contractor["id"] for contractor in contractors]
+        previous_works = {contractor_id: [] for contractor_id in ids}
+        for permit in get_previous_works(session, ApprovedPermit.contractor_id.in_(ids)):
+            previous_works[permit["contractor_id"]].append(permit)
+        total_amounts = dict(session.query(
+            ApprovedPermit.contractor_id, func.sum(ApprovedPermit.project_amount)
+        ).filter(ApprovedPermit.contractor_id.in_(ids)).group_by(ApprovedPermit.contractor_id).all())
+
+        # Same name fallback as /detailed-contractor for contractors without linked permits
+        unlinked = {contractor["name"] for contractor in contractors if not previous_works[contractor["id"]]}
+        if unlinked:
+            works_by_name = {}
+            for permit in get_previous_works(session, ApprovedPermit.contractor_name.in_(unlinked)):
+                works_by_name.setdefault(permit["contractor_name"], []).append(permit)
+            totals_by_name = dict(session.query(
+                ApprovedPermit.contractor_name, func.sum(ApprovedPermit.project_amount)
+            ).filter(ApprovedPermit.contractor_name.in_(unlinked)).group_by(ApprovedPermit.contractor_name).all())
+            for contractor in contractors:
+                if not previous_works[contractor["id"]]:
+                    previous_works[contractor["id"]] = works_by_name.get(contractor["name"], [])
+                    total_amounts[contractor["id"]] = totals_by_name.get(contractor["name"])
+
+    return contractors, previous_works, {contractor_id: total_amounts.get(contractor_id) for contractor_id in ids}
 
 def model_to_dict(model_instance):
     """Convert a SQLAlchemy model instance into a dictionary."""
@@ -117,22 +422,37 @@ def model_to_dict(model_instance):
     }
 
 def serialize_query_result(query_result):
-    """Convert a list of model instances into a JSON string."""
-    data = [model_to_dict(row) for row in query_result]
+    """Convert a list of model instances (or rows already converted to dicts) into a JSON string."""
+    data = [row if isinstance(row, dict) else model_to_dict(row) for row in query_result]
     return json.dumps(data, default=str)  # default=str handles datetime and other non-serializable objects
 
 
-def get_total_project_amount_for_contractor(contractor_name: str):
+def get_previous_works(session, condition):
+    return [
+        model_to_dict(permit)
+        for permit in session.query(ApprovedPermit)
+        .join(Address, ApprovedPermit.project_address_id == Address.id)
+        .filter(condition)
+        .order_by(ApprovedPermit.project_id)
+        .all()
+    ]
+
+def get_total_project_amount_for_contractor(contractor_id: int, contractor_name: str = None):
+    """Sum of permit values for a contractor, by linked id or, if given, by the unlinked applicant name."""
+    condition = ApprovedPermit.contractor_id == contractor_id if contractor_name is None \
+        else ApprovedPermit.contractor_name == contractor_name
     with get_session() as session:
         total_amount = session.query(
             func.sum(ApprovedPermit.project_amount)
-        ).filter(
-            ApprovedPermit.contractor_name == contractor_name
-        ).scalar()
+        ).filter(condition).scalar()
     return total_amount
 
-def fuzzy_search_contractors(search_query, threshold=75):
+def fuzzy_search_contractors(search_query, threshold=75, snapshot=None):
     search_query = search_query.lower()
+    if snapshot is not None:
+        candidates = [(name,) for name in snapshot.contractor_name_candidates(search_query)]
+        return _score_candidates(candidates, search_query, threshold)
+
     with get_session() as session:
         # Step 1: Fetch distinct contractor names from ApprovedPermit
         candidates = session.query(
@@ -150,22 +470,24 @@ def fuzzy_search_contractors(search_query, threshold=75):
                 ApprovedPermit.contractor_name != None
             ).limit(50).all()
 
-        # Step 3: Compute fuzzy match scores and filter by threshold
-        results = []
-        for (contractor_name,) in candidates:
-            score = fuzz.ratio(contractor_name.lower(), search_query)
-            if score >= threshold:
-                results.append((contractor_name, score))
+    return _score_candidates(candidates, search_query, threshold)
 
-        # Step 4: Sort results by score (highest first)
-        results.sort(key=lambda x: x[1], reverse=True)
+def _score_candidates(candidates, search_query, threshold):
+    # Step 3: Compute fuzzy match scores and filter by threshold
+    results = []
+    for (contractor_name,) in candidates:
+        score = fuzz.ratio(contractor_name.lower(), search_query)
+        if score >= threshold:
+            results.append((contractor_name, round(score)))
 
+    # Step 4: Sort results by score (highest first)
+    results.sort(key=lambda x: x[1], reverse=True)
     return results
 
 
 
-def gpt_search(query):
-    response = client.chat.completions.create(
+async def gpt_search(query):
+    response = await llm_gateway.chat_completion(
         model="gpt-4o",
         messages=[
             {
@@ -173,7 +495,7 @@ def gpt_search(query):
                 "content": [
                     {
                         "type": "text",
-                        "text": "You are a financial and civil advisor for homeowners. You provide advice to homeowners on their selected home improvement contractor. You are given the past history (i.e. past projects) of each contractor (some of the details of which might be trimmed) and their licensing history. Analyze the information you are given and make a short (under 100 words) recommendation on whether on not to hire this home improvement contractor for a home improvement project at my residence. Judge based on contractor's experience, and diversity of skill sets. For example If a contractor pulls multiple permits for different addresses, in a short period of time, you might identify them as high risk since they are over-committing putting in doubt their ability to complete the job."
+                        "text": "You are a financial and civil advisor for homeowners. You provide advice to homeowners on their selected home improvement contractor. You are given a summary of the past history (i.e. past projects) of each contractor with a sample of their permits (some of the details of which might be trimmed) and their licensing history. Analyze the information you are given and make a short (under 100 words) recommendation on whether on not to hire this home improvement contractor for a home improvement project at my residence. Judge based on contractor's experience, and diversity of skill sets. For example If a contractor pulls multiple permits for different addresses, in a short period of time, you might identify them as high risk since they are over-committing putting in doubt their ability to complete the job."
                     }
                 ]
             },
@@ -0,0 +1,124 @@
+"""
+In-memory grid index over permit locations for "contractors who worked near me".
+
+Every permit with a geocoded address is placed in a square grid cell of GEO_CELL_METERS. Permits are
+stored in numpy arrays sorted by cell key (row << 32 | column), so the cells of one grid row that overlap
+a search circle are a single contiguous slice found with searchsorted. Only those candidates get an
+exact haversine distance. Rebuilt whenever the data version changes, i.e. after each import.
+
+The API imports this module on the first nearby search, so numpy isn't loaded at application startup.
+"""
+import math
+import os
+
+import numpy as np
+from sqlalchemy import select
+
+from api.caching import VersionedCache
+from database import Address, ApprovedPermit, get_session
+
+GEO_CELL_METERS = float(os.getenv("GEO_CELL_METERS", 250))
+GEO_MAX_RADIUS_METERS = float(os.getenv("GEO_MAX_RADIUS_METERS", 5000))
+
+EARTH_RADIUS_METERS = 6371008.8
+METERS_PER_DEGREE_LATITUDE = 111320.0
+
+
+class GridIndex:
+    def __init__(self, project_ids, contractor_ids, latitudes, longitudes, cell_meters=GEO_CELL_METERS):
+        """Parallel sequences per permit; contractor ids are -1 for permits not linked to a contractor."""
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        reference_latitude = float(np.median(latitudes)) if len(latitudes) else 42.36
+        self.cell_latitude = cell_meters / METERS_PER_DEGREE_LATITUDE
+        self.cell_longitude = cell_meters / (METERS_PER_DEGREE_LATITUDE * math.cos(math.radians(reference_latitude)))
+
+        keys = self._cell_keys(latitudes, longitudes)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.project_ids = np.asarray(project_ids, dtype=np.int64)[order]
+        self.contractor_ids = np.asarray(contractor_ids, dtype=np.int64)[order]
+        self.latitudes = latitudes[order]
+        self.longitudes = longitudes[order]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _rows_and_columns(self, latitudes, longitudes):
+        # Offset so cells are non-negative for any valid coordinate
+        rows = np.floor((np.asarray(latitudes) + 90) / self.cell_latitude).astype(np.int64)
+        columns = np.floor((np.asarray(longitudes) + 180) / self.cell_longitude).astype(np.int64)
+        return rows, columns
+
+    def _cell_keys(self, latitudes, longitudes):
+        rows, columns = self._rows_and_columns(latitudes, longitudes)
+        return (rows << 32) | columns
+
+    def within(self, latitude, longitude, radius_meters):
+        """Positions of permits within `radius_meters` of the point, nearest first, and their distances."""
+        latitude_span = radius_meters / METERS_PER_DEGREE_LATITUDE
+        longitude_span = radius_meters / (METERS_PER_DEGREE_LATITUDE * max(math.cos(math.radians(latitude)), 1e-6))
+        (first_row, last_row), (first_column, last_column) = self._rows_and_columns(
+            [latitude - latitude_span, latitude + latitude_span], [longitude - longitude_span, longitude + longitude_span]
+        )
+
+        # One contiguous run of keys per grid row
+        rows = np.arange(first_row, last_row + 1, dtype=np.int64) << 32
+        starts = np.searchsorted(self.keys, rows | first_column, side="left")
+        ends = np.searchsorted(self.keys, rows | last_column, side="right")
+        slices = [np.arange(start, end) for start, end in zip(starts, ends) if end > start]
+        if not slices:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        candidates = np.concatenate(slices)
+        distances = haversine_meters(latitude, longitude, self.latitudes[candidates], self.longitudes[candidates])
+        inside = distances <= radius_meters
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        return candidates[order], distances[order]
+
+    def nearest_project_ids(self, positions, distances, limit):
+        """{project id: distance in meters} of the first `limit` positions returned by `within`."""
+        return {int(project_id): round(float(distance), 1)
+                for project_id, distance in zip(self.project_ids[positions[:limit]], distances[:limit])}
+
+    def top_contractors(self, positions, distances, limit):
+        """
+        {contractor id: {"permits_nearby", "nearest_m"}} for the `limit` linked contractors with the most permits
+        among `positions`, ties broken by the nearest permit.
+        """
+        # Positions are sorted by distance, so each contractor's first occurrence is their nearest permit
+        contractor_ids, first_seen, counts = np.unique(self.contractor_ids[positions], return_index=True, return_counts=True)
+        linked = contractor_ids >= 0
+        contractor_ids, first_seen, counts = contractor_ids[linked], first_seen[linked], counts[linked]
+        top = np.lexsort((first_seen, -counts))[:limit]
+        return {
+            int(contractor_ids[i]): {"permits_nearby": int(counts[i]), "nearest_m": round(float(distances[first_seen[i]]), 1)}
+            for i in top
+        }
+
+
+def haversine_meters(latitude, longitude, latitudes, longitudes):
+    latitude, longitude = math.radians(latitude), math.radians(longitude)
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    a = (np.sin((latitudes - latitude) / 2) ** 2
+         + math.cos(latitude) * np.cos(latitudes) * np.sin((longitudes - longitude) / 2) ** 2)
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(a))
+
+
+def build_permit_grid():
+    with get_session() as session:
+        rows = session.execute(
+            select(ApprovedPermit.project_id, ApprovedPermit.contractor_id, Address.latitude, Address.longitude)
+            .join(Address, ApprovedPermit.project_address_id == Address.id)
+            .where(Address.latitude.is_not(None), Address.longitude.is_not(None),
+                   Address.latitude.between(-90, 90), Address.longitude.between(-180, 180),
+                   Address.latitude != 0)
+        ).all()
+    if not rows:
+        return GridIndex([], [], [], [])
+    project_ids, contractor_ids, latitudes, longitudes = zip(*rows)
+    return GridIndex(project_ids, [-1 if cid is None else cid for cid in contractor_ids], latitudes, longitudes)
+
+
+permit_grid = VersionedCache("permit grid index", build_permit_grid)
@@ -0,0 +1,94 @@
+"""
+Async gateway for OpenAI chat completions.
+
+Every call goes through one AsyncOpenAI client with per-attempt timeouts and retries, a semaphore caps
+how many completions run at once per worker, and identical concurrent requests (same model, messages
+and parameters) share a single in-flight completion instead of each paying for their own.
+
+Point OPENAI_BASE_URL at benchmarks/fake_openai.py to exercise it without the real API.
+"""
+import asyncio
+import hashlib
+import json
+import os
+
+import metrics
+from metrics.collectors import OPENAI_COALESCED, OPENAI_IN_FLIGHT
+
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", 30))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 2))
+# Completions running at once in this worker; further calls wait for a slot
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", 8))
+
+
+class LLMGateway:
+    def __init__(self, max_concurrency=OPENAI_MAX_CONCURRENCY, timeout=OPENAI_TIMEOUT_SECONDS,
+                 max_retries=OPENAI_MAX_RETRIES, client=None):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._client = client
+        self._owns_client = client is None
+        self._loop = None
+        self._semaphore = None
+        self._in_flight = {}  # request key -> asyncio.Task
+
+    @property
+    def client(self):
+        # Created on first use, so importing the API doesn't require OPENAI_API_KEY
+        if self._client is None:
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(timeout=self.timeout, max_retries=self.max_retries)
+        return self._client
+
+    @staticmethod
+    def _key(model, messages, params):
+        payload = json.dumps([model, messages, params], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _bind_loop(self):
+        # Semaphores, tasks and the client's connections belong to one event loop; start over if we are
+        # called from another (e.g. a new TestClient)
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._in_flight = {}
+            if self._owns_client:
+                self._client = None
+
+    def _finished(self, key, task):
+        self._in_flight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # Retrieved here in case every caller was cancelled before it finished
+
+    async def _complete(self, model, messages, params):
+        async with self._semaphore:
+            OPENAI_IN_FLIGHT.labels(model).inc()
+            try:
+                with metrics.track_openai_call(model) as call:
+                    call["response"] = response = await self.client.chat.completions.create(
+                        model=model, messages=messages, **params
+                    )
+            finally:
+                OPENAI_IN_FLIGHT.labels(model).dec()
+        return response
+
+    async def chat_completion(self, model, messages, **params):
+        """
+        Create a chat completion, or join an identical one that is already running.
+        A caller that is cancelled (e.g. its client disconnected) doesn't cancel the call for the others.
+        """
+        self._bind_loop()
+        key = self._key(model, messages, params)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._complete(model, messages, params))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            OPENAI_COALESCED.labels(model).inc()
+        return await asyncio.shield(task)
+
+
+llm_gateway = LLMGateway()
@@ -0,0 +1,172 @@
+"""
+Condenses a contractor's permit history into a compact prompt for gpt_search.
+
+Instead of every column of every permit, the model gets aggregate features (permits per month,
+concurrently open jobs, value distribution, status mix, top work types) and a small sample of
+representative permits, trimmed to fit PROMPT_TOKEN_BUDGET.
+"""
+import json
+import os
+import statistics
+from collections import Counter
+from datetime import datetime, timedelta
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 1200))
+PROMPT_SAMPLE_PERMITS = int(os.getenv("PROMPT_SAMPLE_PERMITS", 12))
+# Permits carry only a start date, so a job counts as in progress this many days after it started
+ASSUMED_JOB_DAYS = int(os.getenv("PROMPT_ASSUMED_JOB_DAYS", 90))
+COMMENT_CHARS = 120
+TOP_WORK_TYPES = 5
+
+
+def estimate_tokens(text):
+    """Rough GPT token count (about 4 characters per token for English and JSON)."""
+    return len(text) // 4 + 1
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def _monthly_activity(dates):
+    per_month = Counter((date.year, date.month) for date in dates)
+    first, last = min(dates), max(dates)
+    active_span = (last.year - first.year) * 12 + last.month - first.month + 1
+    busiest_month, busiest_count = per_month.most_common(1)[0]
+    return {
+        "active_months": len(per_month),
+        "span_months": active_span,
+        "avg_per_active_month": round(len(dates) / len(per_month), 1),
+        "busiest_month": "%04d-%02d" % busiest_month,
+        "busiest_month_permits": busiest_count,
+        "last_12_months": sum(1 for date in dates if date > last - timedelta(days=365)),
+    }
+
+
+def _concurrency(permits):
+    """Peak number of jobs in progress at once, assuming each takes ASSUMED_JOB_DAYS, and how many addresses."""
+    events = []
+    for date, permit in permits:
+        events.append((date, 1, permit.get("project_address_id")))
+        events.append((date + timedelta(days=ASSUMED_JOB_DAYS), -1, permit.get("project_address_id")))
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    open_jobs = Counter()
+    current, peak, peak_addresses, peak_date = 0, 0, 0, None
+    for date, delta, address_id in events:
+        open_jobs[address_id] += delta
+        current += delta
+        if open_jobs[address_id] == 0:
+            del open_jobs[address_id]
+        if current > peak:
+            peak, peak_addresses, peak_date = current, len(open_jobs), date
+    return {
+        "assumed_job_days": ASSUMED_JOB_DAYS,
+        "peak_concurrent_jobs": peak,
+        "peak_distinct_addresses": peak_addresses,
+        "peak_started": peak_date.strftime("%Y-%m-%d") if peak_date else None,
+    }
+
+
+def summarize_permits(previous_works, total_amount=None):
+    """Aggregate features of a permit history (dicts as returned by the detail endpoints)."""
+    dated = sorted(
+        ((date, permit) for permit in previous_works if (date := _parse_date(permit.get("date_started")))),
+        key=lambda item: item[0]
+    )
+    amounts = sorted(permit["project_amount"] for permit in previous_works if permit.get("project_amount"))
+
+    summary = {
+        "permits": len(previous_works),
+        "distinct_addresses": len({permit.get("project_address_id") for permit in previous_works}),
+        "total_amount": round(total_amount) if total_amount else None,
+    }
+    if dated:
+        summary["first_permit"] = dated[0][0].strftime("%Y-%m-%d")
+        summary["last_permit"] = dated[-1][0].strftime("%Y-%m-%d")
+        summary["activity"] = _monthly_activity([date for date, _ in dated])
+        summary["concurrency"] = _concurrency(dated)
+    if amounts:
+        summary["amounts"] = {
+            "min": round(amounts[0]),
+            "median": round(statistics.median(amounts)),
+            "p90": round(_percentile(amounts, 0.9)),
+            "max": round(amounts[-1]),
+        }
+    summary["status_mix"] = dict(Counter(permit.get("project_status") or "unknown" for permit in previous_works))
+    summary["top_work_types"] = dict(
+        Counter(permit.get("project_description") or "unknown" for permit in previous_works).most_common(TOP_WORK_TYPES)
+    )
+    return summary
+
+
+def sample_permits(previous_works, limit=PROMPT_SAMPLE_PERMITS):
+    """
+    A few representative permits: the largest, the most recent, and the rest spread evenly over time,
+    as compact [date, type, amount, status, comment] rows.
+    """
+    if not previous_works or limit <= 0:
+        return []
+    by_date = sorted(previous_works, key=lambda permit: str(permit.get("date_started") or ""))
+    chosen = {id(permit): permit for permit in sorted(
+        previous_works, key=lambda permit: permit.get("project_amount") or 0, reverse=True
+    )[:max(1, limit // 4)]}
+    for permit in by_date[-max(1, limit // 4):]:
+        chosen.setdefault(id(permit), permit)
+    step = max(1, len(by_date) // max(1, limit - len(chosen)))
+    for permit in by_date[::step]:
+        if len(chosen) >= limit:
+            break
+        chosen.setdefault(id(permit), permit)
+
+    rows = []
+    for permit in sorted(chosen.values(), key=lambda permit: str(permit.get("date_started") or "")):
+        date = _parse_date(permit.get("date_started"))
+        comment = (permit.get("project_comments") or "").strip()
+        rows.append([
+            date.strftime("%Y-%m-%d") if date else None,
+            permit.get("project_description"),
+            round(permit["project_amount"]) if permit.get("project_amount") else None,
+            permit.get("project_status"),
+            comment[:COMMENT_CHARS] + ("..." if len(comment) > COMMENT_CHARS else ""),
+        ])
+    return rows
+
+
+def build_contractor_prompt(previous_works, total_amount=None, contractor=None, token_budget=PROMPT_TOKEN_BUDGET):
+    """
+    The user message for gpt_search: licensing details, history features and sample permits as compact JSON.
+    Over `token_budget`, sample comments are dropped first, then samples from the middle of the timeline.
+    """
+    document = {}
+    if contractor:
+        expire_date = contractor.get("expire_date")
+        document["license"] = {
+            "status": contractor.get("license_status"),
+            "expires": str(expire_date)[:10] if expire_date else None,
+            "company": contractor.get("company"),
+        }
+    document["history"] = summarize_permits(previous_works, total_amount)
+    document["sample_permits_columns"] = ["date", "type", "amount", "status", "comment"]
+    samples = sample_permits(previous_works)
+
+    while True:
+        document["sample_permits"] = samples
+        prompt = json.dumps(document, separators=(",", ":"), default=str)
+        if estimate_tokens(prompt) <= token_budget or not samples:
+            return prompt
+        if any(row[-1] for row in samples):
+            samples = [row[:-1] + [""] for row in samples]
+        else:
+            samples = samples[:len(samples) // 2] + samples[len(samples) // 2 + 1:]
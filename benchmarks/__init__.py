@@ -0,0 +1,3 @@
+from .generators import generate_permits_csv, generate_assessor_csv, generate_licensee_pages
+
+__all__ = ["generate_permits_csv", "generate_assessor_csv", "generate_licensee_pages"]
\ No newline at end of file
@@ -0,0 +1,272 @@
+"""
+Load test for the contractor lookup API.
+
+Seeds a throwaway SQLite database, stubs `gpt_search`, and drives the FastAPI app in-process with
+httpx at increasing concurrency. Reports p50/p95/p99 latency, throughput and error rate per endpoint.
+
+    python -m benchmarks.api_load_test --contractors 2000 --permits 50000 --users 50,100,250,500
+    python -m benchmarks.api_load_test --base-url http://127.0.0.1:8003 --names-from names.txt --users 50
+
+With --base-url the requests go to an already running server and nothing is seeded; --names-from
+lists the contractor names to query, one per line.
+
+Repeated URLs are answered from the API's response cache, so every level runs twice by default: "cold"
+adds a unique throwaway query parameter to each request, which the endpoints ignore but the cache keys
+on, so every request is computed; "warm" sends the plain URLs and mostly measures cache hits.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+
+from benchmarks.generators import FIRST_NAMES, LAST_NAMES, COMPANY_SUFFIXES, NEIGHBORHOODS, STREETS, WORK, STATUSES
+
+# Share of requests per endpoint; the frontend searches on every keystroke and opens a few profiles
+QUERY_MIX = {"fuzzy-contractor": 0.8, "detailed-contractor": 0.2}
+CACHE_MODES = ("cold", "warm")
+# Ignored by the endpoints, but part of the response cache key
+CACHE_BUST_PARAM = "_load_test"
+
+
+def contractor_names(count, rng):
+    names = set()
+    while len(names) < count:
+        if rng.random() < 0.3:
+            name = f"{rng.choice(LAST_NAMES)} & {rng.choice(LAST_NAMES)} {rng.choice(COMPANY_SUFFIXES)}"
+        else:
+            name = f"{rng.choice(FIRST_NAMES)} {chr(rng.randrange(97, 123))} {rng.choice(LAST_NAMES)}"
+        if name in names:
+            name = f"{name} {len(names)}"
+        names.add(name)
+    return sorted(names)
+
+
+def seed_database(engine, contractors, permits, seed=0):
+    """Bulk insert `contractors` contractors and `permits` permits (with addresses) into an initialized database."""
+    from database import Address, ApprovedPermit, Contractor
+
+    rng = random.Random(seed)
+    names = contractor_names(contractors, rng)
+    address_count = max(1, permits // 3)
+    start = datetime(2010, 1, 1)
+
+    with engine.begin() as conn:
+        conn.execute(Contractor.__table__.insert(), [
+            {"license_id": str(100000 + i), "name": name, "company": None, "license_status": "active"}
+            for i, name in enumerate(names)
+        ])
+        addresses = []
+        for i in range(address_count):
+            city, zipcode = rng.choice(NEIGHBORHOODS)
+            addresses.append({
+                "id": i + 1, "street_number": str(i), "street_name": rng.choice(STREETS), "city": city,
+                "state": "ma", "zipcode": zipcode,
+                "latitude": 42.23 + rng.random() * 0.17, "longitude": -71.19 + rng.random() * 0.19,
+            })
+        conn.execute(Address.__table__.insert(), addresses)
+        # Prolific contractors pull most permits, which is what makes detailed lookups expensive
+        rows = []
+        for i in range(permits):
+            permit_type, description = rng.choice(WORK)
+            rows.append({
+                "permit_id": f"alt{i:08d}",
+                "date_started": (start + timedelta(days=rng.randrange(5000))).strftime("%Y-%m-%d %H:%M:%S"),
+                "project_address_id": rng.randint(1, address_count),
+                "project_amount": round(rng.lognormvariate(9.5, 1.3), 2),
+                "project_status": rng.choice(STATUSES).lower(),
+                "contractor_name": names[min(int(rng.paretovariate(1.0)) - 1, len(names) - 1)],
+                "project_description": permit_type.lower(),
+                "project_comments": description.lower(),
+            })
+            if len(rows) == 10000:
+                conn.execute(ApprovedPermit.__table__.insert(), rows)
+                rows = []
+        if rows:
+            conn.execute(ApprovedPermit.__table__.insert(), rows)
+    return names
+
+
+def build_app(database_url, gpt_latency_ms, stub_gpt=True):
+    """
+    Build the API the same way main.py does, against `database_url`. gpt_search is stubbed unless `stub_gpt`
+    is false, in which case calls go through the LLM gateway to OPENAI_BASE_URL (e.g. benchmarks/fake_openai.py).
+    """
+    from fastapi import FastAPI
+
+    os.environ.setdefault("OPENAI_API_KEY", "load-test")
+    import database
+    import api
+    from api import endpoints
+
+    async def fake_gpt_search(query):
+        if gpt_latency_ms:
+            await asyncio.sleep(gpt_latency_ms / 1000)
+        return "Load test verdict."
+
+    if stub_gpt:
+        endpoints.gpt_search = fake_gpt_search
+
+    engine = database.create_db_engine(database_url)
+    database.init(engine)
+    app = FastAPI()
+    app.include_router(api.router, prefix="/api")
+    return app, engine
+
+
+def make_request(rng, names):
+    """Pick an endpoint and query parameters following QUERY_MIX."""
+    endpoint = rng.choices(list(QUERY_MIX), weights=list(QUERY_MIX.values()))[0]
+    # Popular contractors get looked up far more often
+    name = names[min(int(rng.paretovariate(1.2)) - 1, len(names) - 1)]
+    if endpoint == "fuzzy-contractor":
+        kind = rng.random()
+        if kind < 0.4:
+            query = name[:rng.randint(1, 4)]  # Type-ahead on the first keystrokes
+        elif kind < 0.8:
+            query = name[:rng.randint(5, len(name))]
+        else:
+            typo = rng.randrange(len(name))
+            query = name[:typo] + rng.choice("aeiou") + name[typo + 1:]
+        return endpoint, {"contractor_name": query}
+    return endpoint, {"contractor_name": name}
+
+
+async def virtual_user(client, names, deadline, samples, seed, cold=False):
+    rng = random.Random(seed)
+    sent = 0
+    while time.perf_counter() < deadline:
+        endpoint, params = make_request(rng, names)
+        if cold:
+            params[CACHE_BUST_PARAM] = f"{seed}-{sent}"
+        sent += 1
+        started = time.perf_counter()
+        try:
+            response = await client.get(f"/api/{endpoint}", params=params)
+            # 404 is a valid answer for unknown names; anything else non-2xx counts as an error
+            ok = response.status_code < 400 or response.status_code == 404
+        except httpx.HTTPError:
+            ok = False
+        samples[endpoint].append((time.perf_counter() - started, ok))
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    summary = {}
+    for endpoint, endpoint_samples in sorted(samples.items()):
+        latencies = sorted(latency * 1000 for latency, _ in endpoint_samples)
+        errors = sum(1 for _, ok in endpoint_samples if not ok)
+        summary[endpoint] = {
+            "requests": len(endpoint_samples),
+            "throughput_rps": round(len(endpoint_samples) / elapsed, 1),
+            "error_rate": round(errors / len(endpoint_samples), 4) if endpoint_samples else 0,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+        }
+    return summary
+
+
+async def run_level(client, names, users, duration, seed, cold=False):
+    samples = defaultdict(list)
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(client, names, deadline, samples, seed + i, cold) for i in range(users)))
+    return summarize(samples, time.perf_counter() - started)
+
+
+async def run(args, names, transport):
+    results = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(transport=transport, base_url=args.base_url or "http://loadtest", limits=limits, timeout=60) as client:
+        for users in args.users:
+            for mode in args.cache:
+                print(f"Running {users} concurrent users for {args.duration}s ({mode} response cache)...")
+                summary = await run_level(client, names, users, args.duration, args.seed, cold=mode == "cold")
+                for endpoint, stats in summary.items():
+                    print(f"  {endpoint}: {stats['throughput_rps']} req/s, p50 {stats['p50_ms']} ms, "
+                          f"p95 {stats['p95_ms']} ms, p99 {stats['p99_ms']} ms, errors {stats['error_rate']:.2%}")
+                results.append({"users": users, "cache": mode, "endpoints": summary})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/fuzzy-contractor and /api/detailed-contractor.")
+    parser.add_argument("--contractors", type=int, default=2000)
+    parser.add_argument("--permits", type=int, default=50000)
+    parser.add_argument("--users", type=lambda value: [int(v) for v in value.split(",")], default=[50, 100, 250, 500],
+                        help="Comma separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per concurrency level")
+    parser.add_argument("--cache", type=lambda value: value.split(","), default=list(CACHE_MODES),
+                        help="Comma separated response cache modes to run per level: cold (every URL unique, "
+                             "so nothing is served from the cache) and/or warm (plain URLs)")
+    parser.add_argument("--gpt-latency-ms", type=float, default=0, help="Simulated latency of the stubbed gpt_search")
+    parser.add_argument("--fake-openai", action="store_true",
+                        help="Call a local fake OpenAI server (benchmarks/fake_openai.py) through the LLM gateway "
+                             "instead of stubbing gpt_search; --gpt-latency-ms becomes the server's latency")
+    parser.add_argument("--fake-openai-port", type=int, default=8100)
+    parser.add_argument("--base-url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--names-from", help="With --base-url, a file of contractor names (one per line) to query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="load_test_results.json")
+    args = parser.parse_args()
+    if set(args.cache) - set(CACHE_MODES):
+        parser.error(f"--cache takes {' and/or '.join(CACHE_MODES)}")
+
+    with contextlib.ExitStack() as stack:
+        if args.base_url:
+            if not args.names_from:
+                parser.error("--names-from is required with --base-url")
+            with open(args.names_from) as f:
+                names = [line.strip() for line in f if line.strip()]
+            transport = None
+        else:
+            work_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix="api-load-"))
+            if args.fake_openai:
+                from benchmarks.fake_openai import create_app, serve_in_thread
+
+                fake_openai = create_app(args.gpt_latency_ms)
+                server = serve_in_thread(fake_openai, args.fake_openai_port)
+                stack.callback(setattr, server, "should_exit", True)
+                os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.fake_openai_port}/v1"
+            app, engine = build_app(f"sqlite:///{os.path.join(work_dir, 'load_test.db')}", args.gpt_latency_ms,
+                                    stub_gpt=not args.fake_openai)
+            print(f"Seeding {args.contractors} contractors and {args.permits} permits...")
+            names = seed_database(engine, args.contractors, args.permits, args.seed)
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+
+        results = asyncio.run(run(args, names, transport))
+
+    report = {
+        "generated_at": datetime.utcnow().isoformat(),
+        "python": sys.version.split()[0],
+        "contractors": args.contractors,
+        "permits": args.permits,
+        "duration_s": args.duration,
+        "gpt_latency_ms": args.gpt_latency_ms,
+        "fake_openai": args.fake_openai,
+        "cache_modes": args.cache,
+        "target": args.base_url or "in-process",
+        "levels": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
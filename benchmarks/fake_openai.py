@@ -0,0 +1,137 @@
+"""
+Minimal OpenAI-compatible server for exercising the LLM gateway without the real API.
+
+Implements POST /v1/chat/completions with a configurable latency and share of failed (HTTP 500) or
+rate limited (HTTP 429) responses, and GET /stats with the number of completions it was asked for.
+
+    python -m benchmarks.fake_openai --port 8100 --latency-ms 1500 --error-rate 0.1
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=fake uvicorn main:app --port 8003
+
+    python -m benchmarks.fake_openai --check --callers 20
+
+--check starts the server in-process, sends one identical and then --callers distinct completions from
+--callers concurrent callers through api.llm_gateway, and reports how many requests reached the server.
+"""
+import argparse
+import asyncio
+import os
+import random
+import threading
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(latency_ms=1000, error_rate=0.0, rate_limit_rate=0.0, seed=None):
+    app = FastAPI()
+    rng = random.Random(seed)
+    stats = {"requests": 0, "completed": 0, "errors": 0, "rate_limited": 0, "max_concurrent": 0}
+    concurrent = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        nonlocal concurrent
+        body = await request.json()
+        stats["requests"] += 1
+        concurrent += 1
+        stats["max_concurrent"] = max(stats["max_concurrent"], concurrent)
+        try:
+            await asyncio.sleep(latency_ms / 1000)
+            roll = rng.random()
+            if roll < rate_limit_rate:
+                stats["rate_limited"] += 1
+                return JSONResponse(status_code=429, headers={"retry-after-ms": "50"}, content={
+                    "error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}
+                })
+            if roll < rate_limit_rate + error_rate:
+                stats["errors"] += 1
+                return JSONResponse(status_code=500, content={"error": {"message": "Fake failure", "type": "server_error"}})
+        finally:
+            concurrent -= 1
+
+        stats["completed"] += 1
+        prompt_chars = sum(len(str(message.get("content"))) for message in body.get("messages", []))
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "Fake verdict: this contractor looks fine."},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": 9, "total_tokens": prompt_chars // 4 + 9},
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    app.state.stats = stats
+    return app
+
+
+def serve_in_thread(app, port):
+    """Run `app` with uvicorn on 127.0.0.1:`port` in a daemon thread; returns the server."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="fake-openai", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+async def check_gateway(callers, port):
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    from api.llm_gateway import LLMGateway
+
+    gateway = LLMGateway()
+    messages = [{"role": "user", "content": "Should I hire this contractor?"}]
+    started = time.perf_counter()
+    identical = await asyncio.gather(
+        *(gateway.chat_completion("gpt-4o", messages) for _ in range(callers)), return_exceptions=True
+    )
+    identical_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    distinct = await asyncio.gather(*(
+        gateway.chat_completion("gpt-4o", [{"role": "user", "content": f"Contractor {i}"}]) for i in range(callers)
+    ), return_exceptions=True)
+    distinct_seconds = time.perf_counter() - started
+    return identical, identical_seconds, distinct, distinct_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server.")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=1000)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with HTTP 429")
+    parser.add_argument("--check", action="store_true", help="Exercise api.llm_gateway against the server and exit")
+    parser.add_argument("--callers", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.error_rate, args.rate_limit_rate)
+    if not args.check:
+        import uvicorn
+        uvicorn.run(app, host="127.0.0.1", port=args.port)
+        return
+
+    server = serve_in_thread(app, args.port)
+    identical, identical_seconds, distinct, distinct_seconds = asyncio.run(check_gateway(args.callers, args.port))
+    stats = app.state.stats
+    for label, results, seconds in (("identical", identical, identical_seconds), ("distinct", distinct, distinct_seconds)):
+        failed = sum(1 for result in results if isinstance(result, Exception))
+        print(f"{len(results)} {label} calls in {seconds:.2f}s, {failed} failed after retries")
+    print(f"Server saw {stats['requests']} requests ({stats['errors']} failed, {stats['rate_limited']} rate limited, "
+          f"at most {stats['max_concurrent']} at once)")
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Synthetic inputs shaped like the real upstream sources, so importers can be benchmarked offline.
+All generators are deterministic for a given seed.
+"""
+import csv
+import os
+import random
+from datetime import datetime, timedelta
+
+NEIGHBORHOODS = [
+    ("boston", "02108"), ("boston", "02116"), ("dorchester", "02122"), ("dorchester", "02124"),
+    ("roxbury", "02119"), ("jamaica plain", "02130"), ("south boston", "02127"), ("east boston", "02128"),
+    ("charlestown", "02129"), ("brighton", "02135"), ("allston", "02134"), ("west roxbury", "02132"),
+    ("roslindale", "02131"), ("hyde park", "02136"), ("mattapan", "02126"),
+]
+STREETS = [
+    "washington st", "massachusetts ave", "centre st", "tremont st", "blue hill ave", "dorchester ave",
+    "commonwealth ave", "beacon st", "boylston st", "hyde park ave", "adams st", "east broadway",
+    "cambridge st", "south st", "bennington st", "columbia rd", "american legion hwy", "harvard ave",
+]
+FIRST_NAMES = [
+    "john", "michael", "david", "james", "robert", "maria", "jose", "kevin", "brian", "patrick",
+    "thomas", "daniel", "paul", "mark", "steven", "anthony", "sean", "joseph", "linda", "carlos",
+]
+LAST_NAMES = [
+    "sullivan", "murphy", "oconnor", "nguyen", "silva", "walsh", "kelly", "santos", "brennan", "doherty",
+    "ramirez", "flaherty", "costa", "pereira", "mcdonald", "ryan", "tran", "lopez", "kennedy", "fitzgerald",
+]
+COMPANY_SUFFIXES = ["construction", "builders", "home improvement", "contracting", "remodeling", "roofing"]
+WORK = [
+    ("Renovations - Interior NSC", "Kitchen remodel, new cabinets and counters"),
+    ("Renovations - Interior NSC", "Bathroom renovation replace fixtures and tile"),
+    ("Renovations - Exterior", "Strip and reroof, replace shingles"),
+    ("Renovations - Exterior", "Replace windows in kind"),
+    ("Electrical", "Upgrade electrical service to 200 amp"),
+    ("Plumbing", "Replace water heater"),
+    ("Gas", "Install new gas boiler"),
+    ("Addition", "Construct rear addition with deck"),
+    ("Demolition - Interior", "Interior demolition for renovation"),
+    ("Solar", "Install roof mounted solar panels"),
+]
+OCCUPANCY_TYPES = ["1-2FAM", "1-3FAM", "Multi", "Mixed", "Comm", "1Unit", "VacLd"]
+STATUSES = ["Open", "Open", "Closed", "Closed", "Closed", "Stop Work"]
+
+PERMIT_FIELDS = [
+    "permitnumber", "worktype", "permittypedescr", "description", "comments", "applicant",
+    "declared_valuation", "total_fees", "issued_date", "expiration_date", "status", "occupancytype",
+    "sq_feet", "address", "city", "state", "zip", "property_id", "parcel_id", "gpsy", "gpsx",
+    "y_latitude", "x_longitude",
+]
+ASSESSOR_FIELDS = [
+    "PID", "ST_NUM", "ST_NAME", "UNIT_NUM", "CITY", "ZIPCODE", "OCCUPANCY_TYPE", "LAND_VALUE",
+    "BLDG_VALUE", "TOTAL_VALUE", "YR_BUILT", "LATITUDE", "LONGITUDE",
+]
+
+
+def _person(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _address_pool(rng, size):
+    """Addresses shared by permits and assessor rows, so imports see realistic overlap."""
+    pool = []
+    for _ in range(size):
+        city, zipcode = rng.choice(NEIGHBORHOODS)
+        pool.append({
+            "street_number": str(rng.randint(1, 999)),
+            "street_name": rng.choice(STREETS),
+            "city": city,
+            "zip": zipcode,
+            "latitude": round(42.23 + rng.random() * 0.17, 6),
+            "longitude": round(-71.19 + rng.random() * 0.19, 6),
+            "occupancy_type": rng.choice(OCCUPANCY_TYPES),
+        })
+    return pool
+
+
+def _applicant_pool(rng, size):
+    """A skewed set of applicants; a few prolific contractors pull most permits, like the real data."""
+    applicants = []
+    for _ in range(size):
+        if rng.random() < 0.3:
+            applicants.append(f"{rng.choice(LAST_NAMES)} {rng.choice(COMPANY_SUFFIXES)}")
+        else:
+            applicants.append(_person(rng))
+    return applicants
+
+
+def generate_permits_csv(path, rows, seed=0, duplicate_ratio=0.02):
+    """Write a Boston 'approved building permits' CSV with `rows` rows, including some re-issued permit numbers."""
+    rng = random.Random(seed)
+    addresses = _address_pool(rng, max(1, rows // 3))
+    applicants = _applicant_pool(rng, max(1, rows // 20))
+    start = datetime(2010, 1, 1)
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=PERMIT_FIELDS)
+        writer.writeheader()
+        for i in range(rows):
+            permit_no = i if i == 0 or rng.random() > duplicate_ratio else rng.randrange(i)
+            address = rng.choice(addresses)
+            permit_type, description = rng.choice(WORK)
+            issued = start + timedelta(days=rng.randrange(5000), seconds=rng.randrange(86400))
+            valuation = round(rng.lognormvariate(9.5, 1.3), 2)
+            applicant = applicants[min(int(rng.paretovariate(1.2)) - 1, len(applicants) - 1)]
+            writer.writerow({
+                "permitnumber": f"ALT{permit_no:07d}",
+                "worktype": permit_type.split(" ")[0].upper(),
+                "permittypedescr": permit_type,
+                "description": description,
+                "comments": f"{description}. {rng.choice(['As per plans.', 'No structural work.', 'Per code.', ''])}",
+                "applicant": applicant.title(),
+                "declared_valuation": f"${valuation:,.2f}",
+                "total_fees": f"${valuation * 0.01:,.2f}",
+                "issued_date": issued.strftime("%Y-%m-%d %H:%M:%S"),
+                "expiration_date": (issued + timedelta(days=180)).strftime("%Y-%m-%d %H:%M:%S"),
+                "status": rng.choice(STATUSES),
+                "occupancytype": address["occupancy_type"],
+                "sq_feet": rng.randint(0, 3000),
+                "address": f"{address['street_number']} {address['street_name']}".title(),
+                "city": address["city"].title(),
+                "state": "MA",
+                "zip": address["zip"],
+                "property_id": rng.randint(1, 500000),
+                "parcel_id": f"{rng.randint(100000000, 2299999999):010d}",
+                "gpsy": round(address["latitude"] * 70000, 2),
+                "gpsx": round(address["longitude"] * -10000, 2),
+                "y_latitude": address["latitude"],
+                "x_longitude": address["longitude"],
+            })
+    return path
+
+
+def generate_assessor_csv(path, rows, seed=0):
+    """Write a property assessment CSV in the layout `house_value_importer` expects."""
+    rng = random.Random(seed)
+    addresses = _address_pool(rng, max(1, rows))
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=ASSESSOR_FIELDS)
+        writer.writeheader()
+        for i in range(rows):
+            address = addresses[i] if rng.random() > 0.1 else rng.choice(addresses)
+            land = rng.randint(50000, 900000)
+            building = rng.randint(80000, 2500000)
+            writer.writerow({
+                "PID": f"{rng.randint(100000000, 2299999999):010d}",
+                "ST_NUM": address["street_number"],
+                "ST_NAME": address["street_name"].upper(),
+                "UNIT_NUM": rng.choice(["", "", "1", "2", "3"]),
+                # A small share of rows miss the city, which the importer must skip
+                "CITY": address["city"].upper() if rng.random() > 0.01 else "",
+                "ZIPCODE": address["zip"],
+                "OCCUPANCY_TYPE": address["occupancy_type"],
+                "LAND_VALUE": f"{land:,}",
+                "BLDG_VALUE": f"{building:,}",
+                "TOTAL_VALUE": f"{land + building:,}",
+                "YR_BUILT": rng.randint(1850, 2023),
+                "LATITUDE": address["latitude"],
+                "LONGITUDE": address["longitude"],
+            })
+    return path
+
+
+def _licensee_page(rows, page_number, last_page):
+    hidden_fields = "".join(
+        f'<input type="hidden" name="{name}" id="{name}" value="{name.strip("_").lower()}-{page_number}" />'
+        for name in ("__VIEWSTATE", "__VIEWSTATEGENERATOR", "__EVENTVALIDATION")
+    )
+    body = "".join(
+        "<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>"
+        for row in rows
+    )
+    pager = "".join(f'<a href="javascript:__doPostBack(\'Page${n}\')">{n}</a>' for n in range(1, last_page + 1))
+    return (
+        "<html><body><form method=\"post\" action=\"./licenseelist.aspx\">"
+        f"{hidden_fields}"
+        "<table id=\"ctl00_pagecontentplaceholder_gvLicenseeList\">"
+        "<tr><th>Company</th><th>Name</th><th>Registration</th><th>Address</th><th>Expires</th><th>Status</th></tr>"
+        f"{body}<tr><td colspan=\"6\">{pager}</td></tr>"
+        "</table></form></body></html>"
+    )
+
+
+def generate_licensee_pages(directory, pages, rows_per_page=50, seed=0):
+    """
+    Write saved MA home improvement contractor licensee-list pages as page_<n>.html,
+    plus an end_of_results.html page without hidden fields, which is what ends pagination.
+    Returns the list of page paths in order.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    registration = 100000
+    for page_number in range(1, pages + 1):
+        rows = []
+        for _ in range(rows_per_page):
+            registration += rng.randint(1, 3)
+            city, zipcode = rng.choice(NEIGHBORHOODS)
+            company = f"{rng.choice(LAST_NAMES)} {rng.choice(COMPANY_SUFFIXES)}".upper() if rng.random() < 0.7 else ""
+            expires = datetime(2024, 1, 1) + timedelta(days=rng.randrange(1000))
+            rows.append((
+                company,
+                f"{rng.choice(LAST_NAMES)}, {rng.choice(FIRST_NAMES)}".upper(),
+                str(registration),
+                f"{rng.randint(1, 999)} {rng.choice(STREETS).upper()}<br>{city.upper()}, MA {zipcode}",
+                expires.strftime("%m/%d/%Y"),
+                rng.choice(["Active", "Active", "Active", "Expired", "Suspended"]),
+            ))
+        path = os.path.join(directory, f"page_{page_number}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(_licensee_page(rows, page_number, pages))
+        paths.append(path)
+
+    end_path = os.path.join(directory, "end_of_results.html")
+    with open(end_path, "w", encoding="utf-8") as f:
+        f.write("<html><body><p>No more results.</p></body></html>")
+    paths.append(end_path)
+    return paths
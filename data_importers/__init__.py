@@ -1,4 +1,5 @@
 from .boston_importer import update_permits_table_task
 from .ma_contractors_importor import update_contractor_table_task
+from .contractor_linker import link_permits_to_contractors
 
-__all__ = ["update_permits_table_task", "update_contractor_table_task"]
\ No newline at end of file
+__all__ = ["update_permits_table_task", "update_contractor_table_task", "link_permits_to_contractors"]
\ No newline at end of file
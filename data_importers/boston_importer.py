@@ -2,147 +2,309 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from datetime import datetime
-import csv
+import contextvars
+import os
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from sqlalchemy import func, select
+
 # Import your helper functions and models
+from data_importers import columnar_cache, staged_load
+from data_importers.contractor_linker import link_permits_to_contractors
 from data_importers.utils import download_csv, normalize_text, parse_date, parse_float
-from database import Address, Contractor, ApprovedPermit, State, get_session, add_or_update_address
+from database import Address, Contractor, ApprovedPermit, get_session, add_or_update_address, mark_imported
+from database import bulk_load, create_fulltext_index, refresh_fulltext_index
+from database import db_address
+from metrics import ImportStats
+
+import_stats = ImportStats("boston_permits")
+
+# 'incremental' upserts row by row into the live tables, 'staged' loads a shadow table and swaps it in
+PERMITS_IMPORT_MODE = os.getenv("PERMITS_IMPORT_MODE", "incremental").lower()
+# A staged load is rejected if it would shrink the permits table below this share of its current size
+STAGED_MIN_ROW_RATIO = float(os.getenv("PERMITS_STAGED_MIN_ROW_RATIO", 0.9))
+ADDRESS_KEY = ("street_number", "street_name", "city", "state", "zipcode")
+# The dataset columns parse_permit_row reads; the only ones decoded from the columnar cache
+PERMIT_COLUMNS = (
+    "address", "city", "state", "zip", "occupancytype", "y_latitude", "x_longitude", "permitnumber",
+    "issued_date", "declared_valuation", "status", "applicant", "description", "comments",
+)
+# Stored typed in the columnar cache; parse_float/parse_date accept the typed values
+PERMIT_FLOAT_COLUMNS = ("y_latitude", "x_longitude", "declared_valuation")
+PERMIT_TIMESTAMP_COLUMNS = ("issued_date",)
 
 # ---------------------------
 # Parallel Processing Helpers
 # ---------------------------
+def parse_permit_row(row):
+    """
+    Normalize one CSV row into (address_fields, permit_fields).
+    address_fields match add_or_update_address's arguments, permit_fields ApprovedPermit's columns.
+    """
+    # Normalize address fields
+    normalized_address = normalize_text(row['address'])
+    normalized_city = normalize_text(row['city'])
+    normalized_state = normalize_text(row['state'])
+    normalized_zip = normalize_text(row['zip'])
+    normalized_occupancy = normalize_text(row['occupancytype'])
+
+    normalized_address = normalized_address if normalized_address.strip() else None
+    normalized_city = normalized_city if normalized_city.strip() else None
+    normalized_state = normalized_state if normalized_state.strip() else None
+    normalized_zip = normalized_zip if normalized_zip.strip() else None
+    normalized_occupancy = normalized_occupancy if normalized_occupancy.strip() else None
+
+    if normalized_address:
+        raw_address_parts = normalized_address.split(' ')
+        street_number = raw_address_parts[0]
+        street_name = " ".join(raw_address_parts[1:])
+    else:
+        street_number = None
+        street_name = None
+
+    address_fields = {
+        "street_number": street_number,
+        "street_name": street_name,
+        "city": normalized_city,
+        "state": normalized_state,
+        "zipcode": normalized_zip,
+        "occupancy_type": normalized_occupancy,
+        "latitude": parse_float(row['y_latitude']),
+        "longitude": parse_float(row['x_longitude'])
+    }
+
+    # Normalize permit fields
+    permit_id = normalize_text(row['permitnumber'])
+    permit_id = permit_id if permit_id.strip() else None
+    issue_date = parse_date(row['issued_date'])
+    issue_date = issue_date if issue_date.strip() else None
+    project_amount = parse_float(row['declared_valuation'])
+    project_amount = project_amount if project_amount is not None else None
+    project_status = normalize_text(row['status'])
+    project_status = project_status if project_status.strip() else None
+    contractor_name = normalize_text(row['applicant'])
+    contractor_name = contractor_name if contractor_name.strip() else None
+    project_description = normalize_text(row['description'])
+    project_description = project_description if project_description.strip() else None
+
+    permit_fields = {
+        "permit_id": permit_id,
+        "date_started": issue_date,
+        "project_amount": project_amount,
+        "project_status": project_status,
+        "owner_name": None,  # No owner name provided
+        "contractor_name": contractor_name,
+        "project_description": project_description,
+        "project_comments": row['comments'][:1000]  # Trim if needed
+    }
+    return address_fields, permit_fields
+
+
 def process_csv_row(row, line_number):
     """
     Process a single CSV row.
     Each invocation creates its own DB session (sessions aren't thread-safe).
+    Returns the outcome: 'inserted', 'updated' or 'failed'.
     """
     session = get_session()
+    permit_id = None
     try:
-        # Normalize address fields
-        normalized_address = normalize_text(row['address'])
-        normalized_city = normalize_text(row['city'])
-        normalized_state = normalize_text(row['state'])
-        normalized_zip = normalize_text(row['zip'])
-        normalized_occupancy = normalize_text(row['occupancytype'])
-
-        normalized_address = normalized_address if normalized_address.strip() else None
-        normalized_city = normalized_city if normalized_city.strip() else None
-        normalized_state = normalized_state if normalized_state.strip() else None
-        normalized_zip = normalized_zip if normalized_zip.strip() else None
-        normalized_occupancy = normalized_occupancy if normalized_occupancy.strip() else None
-
-        if normalized_address:
-            raw_address_parts = normalized_address.split(' ')
-            street_number = raw_address_parts[0]
-            street_name = " ".join(raw_address_parts[1:])
-        else:
-            street_number = None
-            street_name = None
+        address_fields, permit_fields = parse_permit_row(row)
+        permit_id = permit_fields["permit_id"]
 
         # Add or update address (assumes add_or_update_address returns (address_id, created))
-        address_id, created = add_or_update_address(
-            session=session,
-            street_number=street_number,
-            street_name=street_name,
-            city=normalized_city,
-            state=normalized_state,
-            zipcode=normalized_zip,
-            occupancy_type=normalized_occupancy,
-            latitude=parse_float(row['y_latitude']),
-            longitude=parse_float(row['x_longitude'])
-        )
-
-        # Normalize permit fields
-        permit_id = normalize_text(row['permitnumber'])
-        permit_id = permit_id if permit_id.strip() else None
-        issue_date = parse_date(row['issued_date'])
-        issue_date = issue_date if issue_date.strip() else None
-        project_amount = parse_float(row['declared_valuation'])
-        project_amount = project_amount if project_amount is not None else None
-        project_status = normalize_text(row['status'])
-        project_status = project_status if project_status.strip() else None
-        contractor_name = normalize_text(row['applicant'])
-        contractor_name = contractor_name if contractor_name.strip() else None
-        project_description = normalize_text(row['description'])
-        project_description = project_description if project_description.strip() else None
+        address_id, created = add_or_update_address(session=session, **address_fields)
 
         try:
             # Try inserting the new permit
-            permit = ApprovedPermit(
-                permit_id=permit_id,
-                date_started=issue_date,
-                project_address_id=address_id,
-                project_amount=project_amount,
-                project_status=project_status,
-                owner_name=None,  # No owner name provided
-                contractor_name=contractor_name,
-                project_description=project_description,
-                project_comments=row['comments'][:1000]  # Trim if needed
-            )
+            permit = ApprovedPermit(project_address_id=address_id, **permit_fields)
             session.add(permit)
             session.commit()
             print(f"Added permit: {permit_id} on line {line_number}")
+            return "inserted"
         except Exception as e:
             session.rollback()
             # If permit exists, update instead
             existing_permit = session.query(ApprovedPermit).filter_by(permit_id=permit_id).first()
             if existing_permit:
-                existing_permit.date_started = issue_date
+                existing_permit.date_started = permit_fields["date_started"]
                 existing_permit.project_address_id = address_id
-                existing_permit.project_amount = project_amount
-                existing_permit.project_status = project_status
-                existing_permit.contractor_name = contractor_name
-                existing_permit.project_description = project_description
-                existing_permit.project_comments = row['comments']
+                existing_permit.project_amount = permit_fields["project_amount"]
+                existing_permit.project_status = permit_fields["project_status"]
+                existing_permit.contractor_name = permit_fields["contractor_name"]
+                existing_permit.project_description = permit_fields["project_description"]
+                existing_permit.project_comments = permit_fields["project_comments"]
                 session.commit()
                 print(f"Updated permit: {permit_id} on line {line_number}")
+                return "updated"
             else:
                 print(f"Error processing row {line_number} for permit {permit_id}: {e}")
+                return "failed"
     except Exception as exc:
         print(f"Unexpected error on line {line_number} for permit {permit_id}: {exc}")
         session.rollback()
+        return "failed"
     finally:
         session.close()
 
 
 def import_csv_to_db(csv_file_path):
     """
-    Reads the CSV and processes each row in parallel using a thread pool.
+    Reads the CSV (or its columnar cache) and processes each row in parallel using a thread pool.
     """
     print("Importing data from Boston Permits...")
-    with open(csv_file_path, 'r', encoding='utf-8') as file:
-        csv_reader = csv.DictReader(file)
-        rows = list(csv_reader)
+    with import_stats.phase("parse"):
+        rows = list(columnar_cache.read_rows(csv_file_path, PERMIT_COLUMNS))
 
     # Using 10 worker threads; adjust max_workers as needed.
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {executor.submit(process_csv_row, row, idx+2): idx for idx, row in enumerate(rows)}
+    with import_stats.phase("load"), ThreadPoolExecutor(max_workers=10) as executor:
+        # Each row runs in a copy of this context, so its connections get the bulk_load pragmas too
+        futures = {
+            executor.submit(contextvars.copy_context().run, process_csv_row, row, idx+2): idx
+            for idx, row in enumerate(rows)
+        }
         for future in as_completed(futures):
+            import_stats.row("read")
             try:
-                future.result()
+                import_stats.row(future.result() or "failed")
             except Exception as e:
+                import_stats.row("failed")
                 print(f"Row processing generated an exception: {e}")
 
 
+# ---------------------------
+# Staged Load
+# ---------------------------
+def import_csv_to_db_staged(csv_file_path):
+    """
+    Load the full CSV (or its columnar cache) into a shadow permits table and swap it in atomically.
+    Missing addresses are bulk inserted into the live addresses table first (existing rows are never touched,
+    the same as the incremental path), then permits are bulk loaded without secondary indexes, indexed once,
+    validated against the expected row count and renamed over approved_permits.
+    """
+    print("Importing data from Boston Permits (staged)...")
+    engine = db_address.engine
+    permits_table = ApprovedPermit.__table__
+    shadow_name = f"{permits_table.name}_shadow"
+
+    with import_stats.phase("parse"):
+        parsed = []
+        for line_number, row in enumerate(columnar_cache.read_rows(csv_file_path, PERMIT_COLUMNS), start=2):
+            import_stats.row("read")
+            try:
+                address_fields, permit_fields = parse_permit_row(row)
+            except Exception as e:
+                import_stats.row("failed")
+                print(f"Skipping line {line_number}: {e}")
+                continue
+            if address_fields["city"] is None or address_fields["state"] is None:
+                # addresses.city/state are NOT NULL; the incremental path fails these rows too
+                import_stats.row("failed")
+                continue
+            parsed.append((address_fields, permit_fields))
+
+    with import_stats.phase("addresses"):
+        with engine.connect() as conn:
+            address_ids = {
+                tuple(row[1:]): row[0]
+                for row in conn.execute(select(Address.id, *[getattr(Address, key) for key in ADDRESS_KEY]))
+            }
+            max_address_id = conn.execute(select(func.max(Address.id))).scalar() or 0
+        new_addresses = {}
+        for address_fields, _ in parsed:
+            key = tuple(address_fields[name] for name in ADDRESS_KEY)
+            if key not in address_ids and key not in new_addresses:
+                new_addresses[key] = address_fields
+        staged_load.bulk_insert(engine, Address.__table__, list(new_addresses.values()))
+        with engine.connect() as conn:
+            for row in conn.execute(
+                select(Address.id, *[getattr(Address, key) for key in ADDRESS_KEY]).where(Address.id > max_address_id)
+            ):
+                address_ids[tuple(row[1:])] = row[0]
+
+    with import_stats.phase("load"):
+        # Keep project ids and contractor links stable for permits we already know, so the linking pass only
+        # rewrites rows whose applicant changed; the last row for a permit number wins, like the
+        # update-on-conflict of the incremental path
+        with engine.connect() as conn:
+            project_ids, contractor_ids = {}, {}
+            for permit_id, project_id, contractor_id in conn.execute(
+                select(ApprovedPermit.permit_id, ApprovedPermit.project_id, ApprovedPermit.contractor_id)
+                .where(ApprovedPermit.permit_id.is_not(None))
+            ):
+                project_ids[permit_id] = project_id
+                contractor_ids[permit_id] = contractor_id
+            next_project_id = (conn.execute(select(func.max(ApprovedPermit.project_id))).scalar() or 0) + 1
+            live_count = conn.execute(select(func.count()).select_from(permits_table)).scalar()
+        permits = {}
+        for address_fields, permit_fields in parsed:
+            permit_id = permit_fields["permit_id"]
+            # Rows without a permit number are all kept
+            key = permit_id if permit_id is not None else ("unnumbered", len(permits))
+            if key in permits:
+                project_id = permits[key]["project_id"]
+            elif permit_id in project_ids:
+                project_id = project_ids[permit_id]
+            else:
+                project_id = next_project_id
+                next_project_id += 1
+            permits[key] = {
+                **permit_fields,
+                "project_id": project_id,
+                "contractor_id": contractor_ids.get(permit_id),
+                "project_address_id": address_ids[tuple(address_fields[name] for name in ADDRESS_KEY)],
+            }
+        for permit in permits.values():
+            import_stats.row("updated" if permit["permit_id"] in project_ids else "inserted")
+
+        shadow = staged_load.create_shadow_table(engine, permits_table, shadow_name)
+        staged_load.bulk_insert(engine, shadow, list(permits.values()))
+
+    with import_stats.phase("index"):
+        staged_load.build_indexes(engine, permits_table, shadow)
+        create_fulltext_index(engine, shadow_name)
+
+    loaded = staged_load.count_rows(engine, shadow_name)
+    if loaded != len(permits) or loaded < live_count * STAGED_MIN_ROW_RATIO:
+        staged_load.drop_table_if_exists(engine, shadow_name)
+        raise RuntimeError(
+            f"Staged permits load rejected: loaded {loaded} rows, expected {len(permits)}, live table has {live_count}"
+        )
+
+    with import_stats.phase("swap"):
+        staged_load.swap_tables(engine, permits_table.name, shadow_name)
+    print(f"Swapped in {loaded} permits ({len(new_addresses)} new addresses)")
+
+
 # ---------------------------
 # Scheduled Task
 # ---------------------------
 def update_permits_table_task():
     """Scheduled task to update the permits table and record the update timestamp."""
     print(f"Boston Permit Import Task started at {datetime.now()}")
+    import_stats.reset()
     # Download CSV (download_csv should accept a URL and a save path)
-    csv_file_path = download_csv("https://data.boston.gov/dataset/cd1ec3ff-6ebf-4a65-af68-8329eceab740/resource/6ddcd912-32a0-43df-9908-63574f8c7e77/download/tmpfpuiefir.csv", "permits.csv")
+    with import_stats.phase("download"):
+        csv_file_path = download_csv("https://data.boston.gov/dataset/cd1ec3ff-6ebf-4a65-af68-8329eceab740/resource/6ddcd912-32a0-43df-9908-63574f8c7e77/download/tmpfpuiefir.csv", "permits.csv")
     if csv_file_path:
-        # Process CSV rows concurrently
-        import_csv_to_db(csv_file_path)
-        # Update state table timestamp
-        with get_session() as session:
-            state = session.query(State).first()
-            if not state:
-                state = State()
-                session.add(state)
-            state.boston_permits_update_ts = datetime.utcnow()
-            session.commit()
+        # Typed, compressed copy of the download; re-imports of the same file skip CSV parsing
+        with import_stats.phase("convert"):
+            dataset_path = columnar_cache.ensure_columnar_cache(
+                csv_file_path, PERMIT_FLOAT_COLUMNS, PERMIT_TIMESTAMP_COLUMNS
+            ) or csv_file_path
+        # SQLite only: relaxed durability and a bigger page cache while loading
+        with bulk_load(db_address.engine):
+            if PERMITS_IMPORT_MODE == "staged":
+                import_csv_to_db_staged(dataset_path)
+            else:
+                # Process CSV rows concurrently
+                import_csv_to_db(dataset_path)
+            with import_stats.phase("link"):
+                link_permits_to_contractors()
+            with import_stats.phase("fulltext"):
+                refresh_fulltext_index()
+        # Update state table timestamp, which also tells the API its cached data is stale
+        mark_imported("boston_permits_update_ts")
+        import_stats.finish()
         print(f"Boston Permit Import Task completed successfully at {datetime.now()}")
\ No newline at end of file
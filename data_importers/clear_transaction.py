@@ -1,18 +1,12 @@
-from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
 from sqlalchemy.orm import sessionmaker
 
-# Copy your DB_CONFIG from the original code
-DB_CONFIG = {
-    'host': 'vps0.aseef.dev',
-    'port': 3306,
-    'user': 'civic_hacks',
-    'password': '6ycrmb*L99%gQM',
-    'database': '2025_civic_hackathon'
-}
+from database import create_db_engine
 
 def clear_transaction():
-    connection_string = f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
-    engine = create_engine(connection_string)
+    # Same database as the API: DATABASE_URL or the SQL_* variables, e.g. from .env
+    load_dotenv()
+    engine = create_db_engine()
     Session = sessionmaker(bind=engine)
     session = Session()
     try:
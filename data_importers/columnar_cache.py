@@ -0,0 +1,167 @@
+"""
+Columnar cache of downloaded CSV datasets.
+
+After a download the CSV is converted once into a zstd-compressed Parquet file next to it (permits.csv ->
+permits.parquet). The importer names the columns it parses as numbers or dates: those become float64 or
+timestamps when every value has a plain form ("42.35", "$12,345.67", "YYYY-MM-DD HH:MM:SS"), and stay text
+otherwise. All other columns stay text exactly as in the CSV. The importers read the Parquet file memory
+mapped and decode only the columns they use, so retries and re-imports of the same download skip CSV
+parsing entirely.
+
+The cache records the CSV's size and mtime and the column types, and is rebuilt when they change. Without
+pyarrow, or if a conversion fails, the importers keep reading the CSV.
+"""
+import csv
+import os
+import time
+
+PARQUET_COMPRESSION = os.getenv("COLUMNAR_CACHE_COMPRESSION", "zstd")
+READ_BATCH_ROWS = int(os.getenv("COLUMNAR_CACHE_BATCH_ROWS", 10000))
+
+# Only values parse_float turns into the same float as a plain cast once "$" and "," are removed:
+# a comma without a decimal point would be read as a decimal comma, so those columns stay text
+_NUMBER = r"^\$?-?([1-9][0-9]{0,2}(,[0-9]{3})*\.[0-9]+|(0|[1-9][0-9]*)(\.[0-9]+)?)$"
+_TIMESTAMP = r"^[0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2}$"
+_SOURCE_KEY = b"source_csv"
+
+
+def cache_path_for(csv_path):
+    return f"{os.path.splitext(csv_path)[0]}.parquet"
+
+
+def is_columnar(path):
+    return path.endswith(".parquet")
+
+
+def _source_stamp(csv_path, float_columns, timestamp_columns):
+    stat = os.stat(csv_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}:{','.join(float_columns)}:{','.join(timestamp_columns)}".encode()
+
+
+def _cache_is_current(cache_path, stamp):
+    import pyarrow.parquet as pq
+
+    if not os.path.exists(cache_path):
+        return False
+    try:
+        metadata = pq.read_schema(cache_path).metadata or {}
+    except Exception:
+        return False  # A truncated or foreign file; convert again
+    return metadata.get(_SOURCE_KEY) == stamp
+
+
+def _typed(column, pattern, convert):
+    """`column` (text) converted if every non-empty value matches `pattern`, else unchanged."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    values = pc.utf8_trim_whitespace(column)
+    present = pc.not_equal(values, "")
+    if not pc.any(present).as_py():
+        return column
+    if not pc.all(pc.or_(pc.invert(present), pc.match_substring_regex(values, pattern))).as_py():
+        return column
+    try:
+        return convert(pc.if_else(present, values, pa.scalar(None, pa.string())))
+    except pa.ArrowInvalid:
+        return column  # e.g. an impossible date like 2023-02-30
+
+
+def _to_float(text):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    return pc.cast(pc.replace_substring_regex(text, r"[$,]", ""), pa.float64())
+
+
+def _to_timestamp(text):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    timestamps = pc.strptime(text, format="%Y-%m-%d %H:%M:%S", unit="s")
+    # strptime rolls impossible dates over (2023-02-30 becomes March 2nd), so require an exact round trip
+    if not pc.all(pc.equal(pc.strftime(timestamps, format="%Y-%m-%d %H:%M:%S"), text)).as_py():
+        raise pa.ArrowInvalid("not every value is a valid timestamp")
+    return timestamps
+
+
+def convert_csv(csv_path, cache_path=None, float_columns=(), timestamp_columns=()):
+    """Write `csv_path` as a compressed Parquet file, typing the given columns where lossless, and return its path."""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    cache_path = cache_path or cache_path_for(csv_path)
+    started = time.perf_counter()
+    stamp = _source_stamp(csv_path, float_columns, timestamp_columns)
+    # Read every column as text, like csv.DictReader, and type it afterwards only where that's lossless
+    with open(csv_path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8-sig")]))
+    table = pa_csv.read_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(column_names=header, skip_rows=1),
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),  # Free-text comments span lines
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in header}, strings_can_be_null=False,
+        ),
+    )
+    columns = []
+    for name, column in zip(table.column_names, table.columns):
+        if name in float_columns:
+            column = _typed(column, _NUMBER, _to_float)
+        elif name in timestamp_columns:
+            column = _typed(column, _TIMESTAMP, _to_timestamp)
+        columns.append(column)
+    table = pa.table(columns, names=table.column_names)
+    table = table.replace_schema_metadata({_SOURCE_KEY: stamp})
+
+    tmp_path = f"{cache_path}.tmp-{os.getpid()}"
+    try:
+        pq.write_table(table, tmp_path, compression=PARQUET_COMPRESSION)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, cache_path)
+    print(f"Converted {csv_path} ({os.path.getsize(csv_path) / 2**20:.1f} MB) to {cache_path} "
+          f"({os.path.getsize(cache_path) / 2**20:.1f} MB) in {time.perf_counter() - started:.1f}s")
+    return cache_path
+
+
+def ensure_columnar_cache(csv_path, float_columns=(), timestamp_columns=()):
+    """
+    Path of the up-to-date Parquet cache of `csv_path`, converting it first if needed. `float_columns` and
+    `timestamp_columns` are the columns the importer parses with parse_float and parse_date.
+    Returns None when pyarrow isn't installed or the conversion fails, so callers fall back to the CSV.
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("pyarrow is not installed, importing from the CSV")
+        return None
+    cache_path = cache_path_for(csv_path)
+    if _cache_is_current(cache_path, _source_stamp(csv_path, float_columns, timestamp_columns)):
+        print(f"Columnar cache {cache_path} is up to date.")
+        return cache_path
+    try:
+        return convert_csv(csv_path, cache_path, float_columns, timestamp_columns)
+    except Exception as e:
+        print(f"Failed to convert {csv_path} to Parquet, importing from the CSV: {e}")
+        return None
+
+
+def read_rows(path, columns):
+    """
+    Rows of a dataset as dicts. From a Parquet cache only `columns` are read and decoded, with numbers as
+    floats and timestamps as datetimes; from a CSV every column is read as text.
+    """
+    if not is_columnar(path):
+        with open(path, "r", encoding="utf-8") as file:
+            yield from csv.DictReader(file)
+        return
+
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    for batch in parquet_file.iter_batches(batch_size=READ_BATCH_ROWS, columns=list(columns)):
+        yield from batch.to_pylist()
@@ -0,0 +1,122 @@
+"""
+Entity resolution from Boston permit applicants to licensed MA contractors.
+
+Permits only name their applicant as free text, so after every import each distinct applicant name is
+mapped to a Contractor: first by exact match on a normalized key (name or company), then by rapidfuzz
+batch matching within blocks that share the first letter of the token-sorted key. The result is stored as the indexed
+integer approved_permits.contractor_id, which per-contractor queries use instead of string equality.
+"""
+import os
+import re
+import time
+from collections import defaultdict
+
+from rapidfuzz import fuzz, process
+from sqlalchemy import bindparam, select, update
+
+from database import ApprovedPermit, Contractor, get_session
+from database import db_address
+
+# token_sort_ratio a fuzzy match must reach; high because a wrong link is worse than no link
+LINK_SCORE_CUTOFF = int(os.getenv("CONTRACTOR_LINK_SCORE_CUTOFF", 92))
+FUZZY_CHUNK_SIZE = 1000
+UPDATE_CHUNK_SIZE = 5000
+
+_PUNCTUATION = re.compile(r"[^a-z0-9 ]+")
+_NOISE_WORDS = {
+    "inc", "llc", "corp", "co", "company", "corporation", "ltd", "incorporated", "the", "dba", "and",
+}
+
+
+def normalize_name_key(name):
+    """Lowercase, strip punctuation and legal suffixes, so 'Smith & Sons, Inc.' and 'smith sons' compare equal."""
+    if not name:
+        return None
+    words = _PUNCTUATION.sub(" ", name.lower().replace("&", " and ")).split()
+    key = " ".join(word for word in words if word not in _NOISE_WORDS)
+    return key or None
+
+
+def _block(key):
+    """Fuzzy matching block of a key: the first letter of its alphabetically first word, as token_sort_ratio sees it."""
+    return min(key.split())[0]
+
+
+def _contractor_keys(session):
+    """Map normalized name/company keys to a contractor id, dropping keys shared by several contractors."""
+    ids_by_key = defaultdict(set)
+    for contractor_id, name, company in session.execute(select(Contractor.id, Contractor.name, Contractor.company)):
+        for key in (normalize_name_key(name), normalize_name_key(company)):
+            if key:
+                ids_by_key[key].add(contractor_id)
+    return {key: next(iter(ids)) for key, ids in ids_by_key.items() if len(ids) == 1}
+
+
+def resolve_applicants(applicant_names, contractor_keys, score_cutoff=LINK_SCORE_CUTOFF):
+    """Return {applicant name: contractor id} for every name that resolves unambiguously."""
+    resolved = {}
+    unmatched_by_block = defaultdict(list)
+    for name in applicant_names:
+        key = normalize_name_key(name)
+        if not key:
+            continue
+        if key in contractor_keys:
+            resolved[name] = contractor_keys[key]
+        else:
+            unmatched_by_block[_block(key)].append((name, key))
+
+    keys_by_block = defaultdict(list)
+    for key in contractor_keys:
+        keys_by_block[_block(key)].append(key)
+
+    for block, unmatched in unmatched_by_block.items():
+        choices = keys_by_block.get(block)
+        if not choices:
+            continue
+        for start in range(0, len(unmatched), FUZZY_CHUNK_SIZE):
+            chunk = unmatched[start:start + FUZZY_CHUNK_SIZE]
+            scores = process.cdist(
+                [key for _, key in chunk], choices, scorer=fuzz.token_sort_ratio,
+                score_cutoff=score_cutoff, workers=-1
+            )
+            best = scores.max(axis=1)
+            for row, (name, _) in enumerate(chunk):
+                if best[row] < score_cutoff:
+                    continue
+                # Skip ties between different contractors; a contractor's name and company keys may both top
+                contractor_ids = {contractor_keys[choices[i]] for i in (scores[row] == best[row]).nonzero()[0]}
+                if len(contractor_ids) == 1:
+                    resolved[name] = contractor_ids.pop()
+    return resolved
+
+
+def link_permits_to_contractors():
+    """Recompute approved_permits.contractor_id for all permits, writing only rows whose link changed."""
+    started = time.perf_counter()
+    with get_session() as session:
+        contractor_keys = _contractor_keys(session)
+        permits = session.execute(
+            select(ApprovedPermit.project_id, ApprovedPermit.contractor_name, ApprovedPermit.contractor_id)
+        ).all()
+
+    resolved = resolve_applicants({name for _, name, _ in permits if name}, contractor_keys)
+    changes = [
+        {"pid": project_id, "cid": resolved.get(name)}
+        for project_id, name, contractor_id in permits
+        if resolved.get(name) != contractor_id
+    ]
+
+    # Primary key updates only; contractor_name has no index to filter on
+    statement = (
+        update(ApprovedPermit.__table__)
+        .where(ApprovedPermit.__table__.c.project_id == bindparam("pid"))
+        .values(contractor_id=bindparam("cid"))
+    )
+    for start in range(0, len(changes), UPDATE_CHUNK_SIZE):
+        with db_address.engine.begin() as conn:
+            conn.execute(statement, changes[start:start + UPDATE_CHUNK_SIZE])
+
+    linked = sum(1 for _, name, _ in permits if name in resolved)
+    print(f"Linked {linked}/{len(permits)} permits to contractors "
+          f"({len(resolved)} applicant names, {len(changes)} rows changed) in {time.perf_counter() - started:.1f}s")
+    return resolved
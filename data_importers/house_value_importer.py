@@ -1,10 +1,13 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.orm import sessionmaker
 import pandas as pd
 import csv
 from typing import Dict, Optional, Tuple
 import logging
 
+from database import bulk_load, create_db_engine, db_address, mark_imported
+from metrics import ImportStats
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -12,22 +15,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Database configuration
-DB_CONFIG = {
-    'host': 'vps0.aseef.dev',
-    'port': 3306,
-    'user': 'civic_hacks',
-    'password': '6ycrmb*L99%gQM',
-    'database': '2025_civic_hackathon'
-}
-
 # Required fields that cannot be NULL
 REQUIRED_FIELDS = {'city'}
 
-def create_db_engine():
-    """Create and return a database engine."""
-    connection_string = f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
-    return create_engine(connection_string, pool_size=5, max_overflow=10)
+import_stats = ImportStats("house_values")
+
+def get_engine():
+    """The engine passed to database.init, or one built from the environment when run as a script."""
+    return db_address.engine or create_db_engine()
 
 def parse_float_value(value) -> Optional[float]:
     """Parse string to float, handling comma-separated numbers."""
@@ -97,6 +92,7 @@ def update_or_create_address(session, data: Dict) -> Tuple[bool, Optional[str]]:
                 WHERE id = :id
             """)
             session.execute(update_query, {'id': existing_address[0], 'house_value': data['house_value']})
+            import_stats.row("updated")
             return True, None
         else:
             # Insert new record with all fields
@@ -110,15 +106,18 @@ def update_or_create_address(session, data: Dict) -> Tuple[bool, Optional[str]]:
                 )
             """)
             session.execute(insert_query, data)
+            import_stats.row("inserted")
             return True, None
 
     except Exception as e:
+        import_stats.row("failed")
         return False, str(e)
 
 def import_csv_to_database(csv_path: str, batch_size: int = 1000, start_from: int = 0) -> None:
     """Import CSV data to database with batch processing."""
-    engine = create_db_engine()
+    engine = get_engine()
     Session = sessionmaker(bind=engine)
+    import_stats.reset()
     
     stats = {
         'total_processed': 0,
@@ -128,7 +127,7 @@ def import_csv_to_database(csv_path: str, batch_size: int = 1000, start_from: in
     }
     
     try:
-        with open(csv_path, 'r') as csvfile:
+        with bulk_load(engine), open(csv_path, 'r') as csvfile:
             reader = csv.DictReader(csvfile)
             batch = []
             
@@ -141,9 +140,11 @@ def import_csv_to_database(csv_path: str, batch_size: int = 1000, start_from: in
                     # Process the row
                     data, error = process_address_row(row)
                     stats['total_processed'] += 1
+                    import_stats.row("read")
                     
                     if error:
                         stats['skipped'] += 1
+                        import_stats.row("skipped")
                         logger.warning(f"Skipping row {row_num}: {error}")
                         continue
                     
@@ -191,6 +192,9 @@ def import_csv_to_database(csv_path: str, batch_size: int = 1000, start_from: in
                 finally:
                     session.close()
                 
+        # Property values are part of the API responses, so cached ones are stale now
+        mark_imported("boston_property_update_ts", engine)
+        import_stats.finish()
         # Log final statistics
         logger.info("Import completed. Statistics:")
         logger.info(f"Total rows processed: {stats['total_processed']}")
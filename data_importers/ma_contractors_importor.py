@@ -6,11 +6,21 @@ import database
 
 from data_importers.utils import normalize_text, parse_date
 from datetime import datetime
-from database import add_or_update_address, add_or_update_contractor, get_session
+from database import add_or_update_address, add_or_update_contractor, get_session, mark_imported, bulk_load, db_address
+from data_importers.contractor_linker import link_permits_to_contractors
+from metrics import ImportStats
 
 # Initial setup
 url = "https://services.oca.state.ma.us/hic/licenseelist.aspx"
-session = requests.Session()
+session = None  # HTTP session for the scraper, created on first use by get_http_session()
+import_stats = ImportStats("mass_contractors")
+
+
+def get_http_session():
+    global session
+    if session is None:
+        session = requests.Session()
+    return session
 
 
 # New function to extract all hidden fields at once
@@ -26,7 +36,7 @@ def extract_hidden_fields(soup):
 def scrape_page(state_code, page_number=1, hidden_fields=None):
     # For first page, do a GET request to obtain hidden fields
     if page_number == 1 or hidden_fields is None:
-        response = session.get(url)
+        response = get_http_session().get(url)
         soup = BeautifulSoup(response.text, "html.parser")
         hidden_fields = extract_hidden_fields(soup)
     # Prepare form data for postback
@@ -43,7 +53,7 @@ def scrape_page(state_code, page_number=1, hidden_fields=None):
         "Content-Type": "application/x-www-form-urlencoded",
     }
     # Send the POST request
-    response = session.post(url, data=post_data, headers=headers)
+    response = get_http_session().post(url, data=post_data, headers=headers)
     soup = BeautifulSoup(response.text, "html.parser")
 
     # Refresh hidden fields from the latest page
@@ -75,7 +85,14 @@ def scrape_page(state_code, page_number=1, hidden_fields=None):
 
 
 def update_contractor_table_task():
+    # SQLite only: relaxed durability and a bigger page cache for this import's connections
+    with bulk_load(db_address.engine):
+        import_contractors()
+
+
+def import_contractors():
     print(f"MA Contractors Import Task started at {datetime.now()}")
+    import_stats.reset()
 
     # Step 1: Scrape multiple pages
     all_data = []
@@ -87,11 +104,12 @@ def update_contractor_table_task():
 
     while has_more_pages:
         print(f"Scraping contractors Page {page_number}")
-        page_data, hidden_fields = scrape_page(
-            state_code="MA",
-            page_number=page_number,
-            hidden_fields=hidden_fields
-        )
+        with import_stats.phase("scrape"):
+            page_data, hidden_fields = scrape_page(
+                state_code="MA",
+                page_number=page_number,
+                hidden_fields=hidden_fields
+            )
 
         # If no data returned or critical hidden field missing, stop pagination
         if not page_data or not hidden_fields.get("__VIEWSTATE"):
@@ -109,6 +127,8 @@ def update_contractor_table_task():
                 registration_no = normalize_text(contractor_data[2])
                 address = normalize_text(contractor_data[3])
                 expire_date = parse_date(contractor_data[4])
+                # DateTime columns need a datetime; pymysql tolerated the string but SQLite does not
+                expire_date = datetime.strptime(expire_date, "%Y-%m-%d %H:%M:%S") if expire_date else None
                 status = normalize_text(contractor_data[5])
 
                 if address is not None:
@@ -135,9 +155,10 @@ def update_contractor_table_task():
                     state = None
 
                 # Insert into contractor table
-                with get_session() as session:
+                import_stats.row("read")
+                with import_stats.phase("load"), get_session() as session:
                     print(f"Adding contractor: {contractor_name} with registration_no: {registration_no}")
-                    add_or_update_contractor(
+                    result = add_or_update_contractor(
                         session=session,
                         license_id=registration_no,
                         name=contractor_name,
@@ -146,6 +167,7 @@ def update_contractor_table_task():
                         license_status=status,
                         expire_date=expire_date
                     )
+                import_stats.row("failed" if result is None else "inserted" if result[1] else "updated")
             session.commit()
             # Adjust page_number if needed. The current logic forces page_number to 16 if less.
             page_number += 1
@@ -153,6 +175,13 @@ def update_contractor_table_task():
         # Optionally, include a short delay to be polite to the server
         # sleep(0.1)
 
+    with import_stats.phase("link"):
+        link_permits_to_contractors()
+
+    # Update state table timestamp, which also tells the API its cached data is stale
+    mark_imported("mass_contractor_update_ts")
+    import_stats.finish()
+
     # Optionally, process or store all_data as needed
     for row in all_data:
         print(row)
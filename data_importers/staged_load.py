@@ -0,0 +1,102 @@
+"""
+Helpers for loading a table's full contents into a shadow copy and swapping it in atomically.
+
+The shadow table is created with only its primary key, filled with bulk inserts, indexed once at the end
+and then renamed over the live table. Readers keep using the old table until the rename and never see a
+partially imported dataset.
+"""
+import uuid
+
+from sqlalchemy import Column, Index, MetaData, Table, text
+
+
+def _quote(engine, name):
+    return engine.dialect.identifier_preparer.quote(name)
+
+
+def create_shadow_table(engine, table, shadow_name):
+    """Create an empty copy of `table` called `shadow_name` without secondary indexes or constraints."""
+    drop_table_if_exists(engine, shadow_name)
+    shadow = Table(
+        shadow_name, MetaData(),
+        *[
+            Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable,
+                   autoincrement=column.autoincrement)
+            for column in table.columns
+        ]
+    )
+    shadow.create(engine)
+    return shadow
+
+
+def drop_table_if_exists(engine, name):
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {_quote(engine, name)}"))
+
+
+def bulk_insert(engine, shadow, rows, chunk_size=5000):
+    """Insert `rows` (dicts) into `shadow` with executemany in chunks, one transaction per chunk."""
+    for start in range(0, len(rows), chunk_size):
+        with engine.begin() as conn:
+            conn.execute(shadow.insert(), rows[start:start + chunk_size])
+
+
+def build_indexes(engine, table, shadow):
+    """
+    Recreate `table`'s unique columns, indexes and foreign keys on `shadow`.
+    Names get a per-run suffix: SQLite index names and MariaDB constraint names are database-wide,
+    and the previous run's names live on in the table we are about to replace.
+    """
+    suffix = uuid.uuid4().hex[:8]
+    indexes = [
+        Index(f"ix_{table.name}_{column.name}_{suffix}", shadow.c[column.name], unique=True)
+        for column in table.columns if column.unique
+    ]
+    indexes += [
+        Index(f"ix_{table.name}_{'_'.join(column.name for column in index.columns)}_{suffix}",
+              *[shadow.c[column.name] for column in index.columns], unique=index.unique)
+        for index in table.indexes
+    ]
+    for index in indexes:
+        index.create(engine)
+
+    if engine.dialect.name != "sqlite":
+        # SQLite can only declare foreign keys at CREATE TABLE time (and doesn't enforce them by default)
+        with engine.begin() as conn:
+            for constraint in table.foreign_key_constraints:
+                columns = [element.parent.name for element in constraint.elements]
+                referred = [element.column.name for element in constraint.elements]
+                conn.execute(text(
+                    f"ALTER TABLE {_quote(engine, shadow.name)} ADD CONSTRAINT "
+                    f"{_quote(engine, 'fk_' + table.name + '_' + '_'.join(columns) + '_' + suffix)} "
+                    f"FOREIGN KEY ({', '.join(map(lambda c: _quote(engine, c), columns))}) "
+                    f"REFERENCES {_quote(engine, constraint.referred_table.name)} "
+                    f"({', '.join(map(lambda c: _quote(engine, c), referred))})"
+                ))
+
+
+def count_rows(engine, name):
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT count(*) FROM {_quote(engine, name)}")).scalar()
+
+
+def swap_tables(engine, live_name, shadow_name):
+    """Atomically replace `live_name` with `shadow_name` and drop the old table."""
+    old_name = f"{live_name}_old"
+    drop_table_if_exists(engine, old_name)
+    live, shadow, old = (_quote(engine, name) for name in (live_name, shadow_name, old_name))
+
+    if engine.dialect.name == "sqlite":
+        # SQLite DDL is transactional, so both renames commit together. pysqlite doesn't open a
+        # transaction for DDL on its own, hence the explicit BEGIN.
+        with engine.begin() as conn:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            conn.execute(text(f"ALTER TABLE {live} RENAME TO {old}"))
+            conn.execute(text(f"ALTER TABLE {shadow} RENAME TO {live}"))
+            conn.execute(text(f"DROP TABLE {old}"))
+    else:
+        with engine.begin() as conn:
+            # A multi-table RENAME TABLE is atomic in MariaDB/MySQL
+            conn.execute(text(f"RENAME TABLE {live} TO {old}, {shadow} TO {live}"))
+        drop_table_if_exists(engine, old_name)
+
@@ -1,5 +1,6 @@
 from dateutil.parser import parse
 
+import math
 import re
 import os
 import requests
@@ -7,6 +8,8 @@ import time
 
 def parse_float(value):
     """Convert string to float, handling currency symbols, empty strings, and invalid values."""
+    if isinstance(value, (int, float)):  # Already typed, e.g. read from a columnar cache
+        return None if math.isnan(value) else float(value)
     try:
         value = normalize_text(value)
 
@@ -31,6 +34,8 @@ def parse_float(value):
 
 def parse_int(value):
     """Convert string to int, handling empty strings and invalid values."""
+    if isinstance(value, (int, float)):
+        return None if math.isnan(value) else int(value)
     try:
         value = normalize_text(value)
         return int(value) if value.strip() else None
@@ -44,6 +49,9 @@ from datetime import datetime
 def parse_date(date_str):
     """Attempt to parse a date string using multiple common formats and normalize it."""
 
+    if isinstance(date_str, datetime):  # Already typed, e.g. read from a columnar cache
+        return date_str.strftime("%Y-%m-%d %H:%M:%S")
+
     date_str = normalize_text(date_str)
 
     if date_str == "" or date_str == None:
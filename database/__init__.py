@@ -1,3 +1,6 @@
-from .db_address import get_session, init, add_or_update_address, add_or_update_contractor, Contractor, Address, ApprovedPermit, State
+from .db_address import get_session, init, get_data_version, mark_imported, add_or_update_address, add_or_update_contractor, Contractor, Address, ApprovedPermit, State, LeaderLease
+from .leader_lease import LeaderElector, try_acquire_lease, release_lease
+from .engine import create_db_engine, database_url_from_env, bulk_load
+from .fulltext import create_fulltext_index, ensure_fulltext_index, refresh_fulltext_index, search_contractors_by_work
 
-__all__ = ["get_session", "init", "add_or_update_address", "add_or_update_contractor", "Contractor", "Address", "ApprovedPermit", "State"]
\ No newline at end of file
+__all__ = ["get_session", "init", "get_data_version", "mark_imported", "add_or_update_address", "add_or_update_contractor", "Contractor", "Address", "ApprovedPermit", "State", "LeaderLease", "LeaderElector", "try_acquire_lease", "release_lease", "create_fulltext_index", "ensure_fulltext_index", "refresh_fulltext_index", "search_contractors_by_work", "create_db_engine", "database_url_from_env", "bulk_load"]
\ No newline at end of file
@@ -1,6 +1,7 @@
 import datetime
 
 from sqlalchemy import Column, Integer, String, ForeignKey, Double, DateTime, UniqueConstraint, Engine
+from sqlalchemy import inspect, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import create_engine
@@ -74,7 +75,9 @@ class ApprovedPermit(Base):
     project_amount = Column(Double)
     project_status = Column(String(1024))  # Will store 'cancelled', 'ongoing', or 'completed'
     owner_name = Column(String(1024))
-    contractor_name = Column(String(1024))
+    contractor_name = Column(String(1024))  # Free-text Boston "applicant"
+    # Resolved from contractor_name after each import, see data_importers/contractor_linker.py
+    contractor_id = Column(Integer, ForeignKey('contractors.id'), index=True)
     project_description = Column(String(1024))
     project_comments = Column(String(1024))
 
@@ -93,6 +96,15 @@ class State(Base):
     # Enforce a single row constraint
     __table_args__ = {'sqlite_autoincrement': True}
 
+
+class LeaderLease(Base):
+    __tablename__ = 'leader_leases'
+
+    name = Column(String(255), primary_key=True)  # One lease per scheduled job, e.g. 'boston_permits_import'
+    holder = Column(String(255))  # Instance id of the current leader, NULL once released
+    expires_at = Column(DateTime, nullable=False)
+    renewed_at = Column(DateTime)
+
 engine = None
 session_creator = None
 # Create all tables based on our models
@@ -102,8 +114,29 @@ def init(engine_ref: Engine):
     engine = engine_ref
     session_creator = sessionmaker(bind=engine)
     Base.metadata.create_all(engine)
+    add_missing_columns(engine)
+    from database.fulltext import ensure_fulltext_index
+    ensure_fulltext_index(engine)
     initialize_or_get_state()
 
+def add_missing_columns(engine_ref: Engine):
+    """create_all() never alters existing tables, so add columns (and their indexes) introduced since."""
+    inspector = inspect(engine_ref)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=engine_ref.dialect)
+            with engine_ref.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            for index in table.indexes:
+                if column.name in index.columns:
+                    index.create(engine_ref)
+            print(f"Added column {table.name}.{column.name}")
+
 def get_session():
     return session_creator()
 
@@ -188,3 +221,27 @@ def initialize_or_get_state() -> State:
         return state
 
     return None
+
+def mark_imported(timestamp_column, engine_ref: Engine = None):
+    """
+    Set a State import timestamp (e.g. 'mass_contractor_update_ts') to now once an import has finished.
+    This advances the data version, so API workers drop responses cached from the previous data.
+    """
+    with (Session(engine_ref) if engine_ref is not None else get_session()) as session:
+        state = session.query(State).first()
+        if not state:
+            state = State()
+            session.add(state)
+        setattr(state, timestamp_column, datetime.datetime.utcnow())
+        session.commit()
+
+def get_data_version():
+    """
+    Timestamps of the last completed imports as (permits, property values, contractors).
+    API data only changes when one of these advances, so they double as a cache version.
+    """
+    with get_session() as session:
+        state = session.query(State).filter_by(id=1).first()
+        if not state:
+            return (datetime.datetime.min,) * 3
+        return state.boston_permits_update_ts, state.boston_property_update_ts, state.mass_contractor_update_ts
\ No newline at end of file
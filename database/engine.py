@@ -0,0 +1,124 @@
+"""
+The one place engines are created, for the API, the importers and the scripts alike.
+
+DATABASE_URL selects the backend. Without it, the MariaDB URL is built from SQL_HOST/SQL_PORT/SQL_USER/
+SQL_PASSWORD/SQL_DATABASE, or SQLITE_PATH selects a local SQLite file. Without any of them engines can't
+be created, so a deployment missing its settings fails instead of serving an empty database.
+
+MariaDB/MySQL connections are pooled with pre-ping and recycling. SQLite connections get WAL journaling,
+synchronous=NORMAL, a large page cache and mmap; connections an importer checks out inside
+`bulk_load(engine)` switch to synchronous=OFF and a bigger cache.
+"""
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", 1800))
+SQLITE_PATH = os.getenv("SQLITE_PATH")
+SQLITE_BUSY_TIMEOUT_SECONDS = float(os.getenv("SQLITE_BUSY_TIMEOUT_SECONDS", 30))
+SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", 64 * 1024))
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", 256 * 1024 * 1024))
+SQLITE_BULK_CACHE_KB = int(os.getenv("SQLITE_BULK_CACHE_KB", 256 * 1024))
+# A power loss during an import may then corrupt the file; imports can simply be rerun on a fresh copy
+SQLITE_BULK_SYNCHRONOUS = os.getenv("SQLITE_BULK_SYNCHRONOUS", "OFF")
+
+# Engines in a bulk_load block in the current context (thread or asyncio task), so API requests served
+# meanwhile keep the durable settings
+_bulk_load_engines = contextvars.ContextVar("bulk_load_engines", default=())
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waited for a connection, in the connection record's
+    info[POOL_WAIT_INFO_KEY] as (seconds, saturated). `saturated` means every pooled and overflow connection
+    was checked out, so the checkout had to wait for one to be returned. Read by metrics.instrument_engine.
+    """
+
+    def _do_get(self):
+        saturated = self._max_overflow > -1 and self.checkedout() >= self.size() + self._max_overflow
+        started = time.perf_counter()
+        connection_record = super()._do_get()
+        connection_record.info[POOL_WAIT_INFO_KEY] = (time.perf_counter() - started, saturated)
+        return connection_record
+
+
+POOL_WAIT_INFO_KEY = "pool_wait"
+
+
+def database_url_from_env():
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return url
+    if os.getenv("SQL_HOST"):
+        return (
+            f"mysql+pymysql://{os.getenv('SQL_USER')}:{os.getenv('SQL_PASSWORD')}"
+            f"@{os.getenv('SQL_HOST')}:{os.getenv('SQL_PORT', 3306)}/{os.getenv('SQL_DATABASE')}"
+        )
+    if SQLITE_PATH:
+        return f"sqlite:///{SQLITE_PATH}"
+    raise RuntimeError("No database configured: set DATABASE_URL, the SQL_* variables or SQLITE_PATH")
+
+
+def create_db_engine(url=None, echo=False):
+    """Create an engine for `url` (default: from the environment) with the backend's tuning applied."""
+    url = make_url(url or database_url_from_env())
+    if url.get_backend_name() != "sqlite":
+        return create_engine(
+            url, echo=echo, pool_pre_ping=True, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+            pool_recycle=DB_POOL_RECYCLE_SECONDS, poolclass=TimedQueuePool,
+        )
+
+    in_memory = url.database in (None, "", ":memory:")
+    engine = create_engine(
+        url, echo=echo,
+        # Importers write from worker threads; SQLite serializes writers and waits up to the timeout for locks
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_SECONDS},
+        # File databases get SQLAlchemy's default QueuePool, timed; in-memory ones keep their per-thread pool
+        **({} if in_memory else {"poolclass": TimedQueuePool}),
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    @event.listens_for(engine, "checkout")
+    def set_sqlite_load_mode(dbapi_connection, connection_record, connection_proxy):
+        # Pragmas are per connection, so pooled connections are switched as they are handed out
+        bulk = engine in _bulk_load_engines.get()
+        if connection_record.info.get("sqlite_bulk") is not bulk:
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"PRAGMA synchronous={SQLITE_BULK_SYNCHRONOUS if bulk else 'NORMAL'}")
+            cursor.execute(f"PRAGMA cache_size=-{SQLITE_BULK_CACHE_KB if bulk else SQLITE_CACHE_KB}")
+            cursor.close()
+            connection_record.info["sqlite_bulk"] = bulk
+
+    return engine
+
+
+@contextmanager
+def bulk_load(engine):
+    """
+    Apply SQLite's bulk-load pragmas to connections checked out of `engine` by this thread or task inside the
+    block; other threads only get them when run with a copy of this context (contextvars.copy_context).
+    No-op on MariaDB/MySQL.
+    """
+    if engine.dialect.name != "sqlite":
+        yield
+        return
+    token = _bulk_load_engines.set(_bulk_load_engines.get() + (engine,))
+    try:
+        yield
+    finally:
+        _bulk_load_engines.reset(token)
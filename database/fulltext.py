@@ -0,0 +1,172 @@
+"""
+Full-text search over permit work descriptions (project_description and project_comments).
+
+MariaDB/MySQL use a FULLTEXT index on approved_permits itself, which InnoDB keeps up to date on every
+write. SQLite uses a separate FTS5 table, permits_fts, with porter stemming, keyed by project_id. The
+permit importer refreshes it after each import. On a SQLite build without FTS5 (detected once by
+ensure_fulltext_index at init) the refresh is skipped and searches fall back to LIKE over both columns.
+"""
+import re
+import weakref
+
+from sqlalchemy import Engine, text
+from sqlalchemy.exc import OperationalError
+
+from database import db_address
+
+FULLTEXT_INDEX_NAME = "ft_permits_work"
+FTS_TABLE = "permits_fts"
+FULLTEXT_COLUMNS = ("project_description", "project_comments")
+MAX_QUERY_TERMS = 8
+# InnoDB ignores shorter words unless innodb_ft_min_token_size is lowered
+MYSQL_MIN_TERM_LENGTH = 3
+
+_WORDS = re.compile(r"\w+")
+_sqlite_fts_available = weakref.WeakKeyDictionary()  # engine -> whether permits_fts can be used
+
+
+def _is_sqlite(engine_ref):
+    return engine_ref.dialect.name == "sqlite"
+
+
+def _has_mysql_fulltext_index(conn, table_name):
+    return conn.execute(text(
+        "SELECT 1 FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = :table AND index_name = :index LIMIT 1"
+    ), {"table": table_name, "index": FULLTEXT_INDEX_NAME}).first() is not None
+
+
+def create_fulltext_index(engine_ref: Engine, table_name="approved_permits"):
+    """Add the FULLTEXT index to `table_name` (e.g. a staged shadow table) on MariaDB/MySQL; no-op on SQLite."""
+    if _is_sqlite(engine_ref):
+        return
+    with engine_ref.begin() as conn:
+        if not _has_mysql_fulltext_index(conn, table_name):
+            conn.execute(text(
+                f"ALTER TABLE {table_name} ADD FULLTEXT INDEX {FULLTEXT_INDEX_NAME} ({', '.join(FULLTEXT_COLUMNS)})"
+            ))
+            print(f"Created full-text index on {table_name}")
+
+
+def ensure_fulltext_index(engine_ref: Engine):
+    """Create the backend's full-text index if it doesn't exist yet, indexing any permits already imported."""
+    if not _is_sqlite(engine_ref):
+        create_fulltext_index(engine_ref)
+        return
+    with engine_ref.connect() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).first() is not None
+    if not exists and not _create_fts_table(engine_ref):
+        _sqlite_fts_available[engine_ref] = False
+        return
+    _sqlite_fts_available[engine_ref] = True
+    if not exists:
+        refresh_fulltext_index(engine_ref)
+
+
+def _create_fts_table(engine_ref):
+    try:
+        with engine_ref.begin() as conn:
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({', '.join(FULLTEXT_COLUMNS)}, tokenize = 'porter unicode61')"
+            ))
+    except OperationalError as e:
+        print(f"Full-text search unavailable, SQLite was built without FTS5; searching with LIKE instead: {e}")
+        return False
+    return True
+
+
+def refresh_fulltext_index(engine_ref: Engine = None):
+    """Re-index all permits in the SQLite FTS table in one transaction. MariaDB/MySQL maintain theirs on write."""
+    engine_ref = engine_ref or db_address.engine
+    if not _is_sqlite(engine_ref):
+        return
+    if not _sqlite_fts_available.get(engine_ref, False):
+        print("Skipping the full-text index refresh, SQLite has no FTS5 table")
+        return
+    columns = ", ".join(FULLTEXT_COLUMNS)
+    with engine_ref.begin() as conn:
+        conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        conn.execute(text(
+            f"INSERT INTO {FTS_TABLE} (rowid, {columns}) SELECT project_id, {columns} FROM approved_permits"
+        ))
+
+
+def search_contractors_by_work(query, limit=20):
+    """
+    Contractors ranked by how many of their permits match every word of `query`, then by total relevance.
+    If no permit has every word, permits matching any of them count instead.
+    Returns dicts with contractor_id, matching_permits, matching_amount, last_matching_permit and relevance.
+    """
+    words = [word.lower() for word in _WORDS.findall(query)][:MAX_QUERY_TERMS]
+    rows = _search(words, limit, match_all=True)
+    if not rows and len(words) > 1:
+        rows = _search(words, limit, match_all=False)
+    return rows
+
+
+def _search(words, limit, match_all):
+    engine_ref = db_address.engine
+    if _is_sqlite(engine_ref) and not _sqlite_fts_available.get(engine_ref, False):
+        return _like_search(engine_ref, words, limit, match_all)
+    if _is_sqlite(engine_ref):
+        terms = " ".join(f'"{word}"' for word in words) if match_all else " OR ".join(f'"{word}"' for word in words)
+        # bm25() can't be used inside an aggregate, so score the matches in a materialized CTE first;
+        # lower bm25 is better, hence the negation
+        sql = f"""
+            WITH m AS MATERIALIZED (
+                SELECT rowid AS project_id, -bm25({FTS_TABLE}) AS score FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :query
+            )
+            SELECT p.contractor_id, count(*) AS matching_permits, sum(p.project_amount) AS matching_amount,
+                   max(p.date_started) AS last_matching_permit, sum(m.score) AS relevance
+            FROM m JOIN approved_permits p ON p.project_id = m.project_id
+            WHERE p.contractor_id IS NOT NULL
+            GROUP BY p.contractor_id
+            ORDER BY matching_permits DESC, relevance DESC
+            LIMIT :limit
+        """
+    else:
+        # The trailing * stands in for stemming ("roof" also finds "roofing"), + makes a word required
+        terms = " ".join(
+            f"{'+' if match_all else ''}{word}*" for word in words if len(word) >= MYSQL_MIN_TERM_LENGTH
+        )
+        match = f"MATCH ({', '.join(FULLTEXT_COLUMNS)}) AGAINST (:query IN BOOLEAN MODE)"
+        sql = f"""
+            SELECT contractor_id, count(*) AS matching_permits, sum(project_amount) AS matching_amount,
+                   max(date_started) AS last_matching_permit, sum({match}) AS relevance
+            FROM approved_permits
+            WHERE {match} AND contractor_id IS NOT NULL
+            GROUP BY contractor_id
+            ORDER BY matching_permits DESC, relevance DESC
+            LIMIT :limit
+        """
+    if not terms:
+        return []
+    with engine_ref.connect() as conn:
+        rows = conn.execute(text(sql), {"query": terms, "limit": limit}).mappings().all()
+    return [dict(row) for row in rows]
+
+
+def _like_search(engine_ref, words, limit, match_all):
+    """Fallback for SQLite without FTS5: substring matches over both columns, relevance is the match count."""
+    if not words:
+        return []
+    conditions, params = [], {"limit": limit}
+    for i, word in enumerate(words):
+        params[f"w{i}"] = "%" + word.replace("_", "\\_") + "%"  # Words are \w+, so _ is the only wildcard
+        conditions.append("(" + " OR ".join(
+            f"lower({column}) LIKE :w{i} ESCAPE '\\'" for column in FULLTEXT_COLUMNS
+        ) + ")")
+    sql = f"""
+        SELECT contractor_id, count(*) AS matching_permits, sum(project_amount) AS matching_amount,
+               max(date_started) AS last_matching_permit, count(*) AS relevance
+        FROM approved_permits
+        WHERE ({(" AND " if match_all else " OR ").join(conditions)}) AND contractor_id IS NOT NULL
+        GROUP BY contractor_id
+        ORDER BY matching_permits DESC
+        LIMIT :limit
+    """
+    with engine_ref.connect() as conn:
+        rows = conn.execute(text(sql), params).mappings().all()
+    return [dict(row) for row in rows]
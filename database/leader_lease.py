@@ -0,0 +1,155 @@
+import os
+import socket
+import threading
+import time
+import uuid
+
+from sqlalchemy import func, or_, text, update
+from sqlalchemy.exc import IntegrityError
+
+from database.db_address import LeaderLease, get_session
+
+# How long a lease stays valid without a heartbeat. Renewals happen every ttl / 3 seconds,
+# so a crashed leader is replaced after at most one ttl.
+LEASE_TTL_SECONDS = int(os.getenv("LEADER_LEASE_TTL_SECONDS", 90))
+
+# Unique per process, so several workers on the same host never share a lease
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _server_utcnow(session, seconds=0):
+    """
+    The database server's current UTC time plus `seconds`, as a SQL expression. Lease times are only ever
+    computed by the database, so clock skew between replicas can't make two of them think they lead.
+    """
+    if session.get_bind().dialect.name == "sqlite":
+        return func.datetime("now", f"{seconds:+d} seconds")
+    return func.timestampadd(text("SECOND"), seconds, func.utc_timestamp())
+
+
+def try_acquire_lease(name, holder=INSTANCE_ID, ttl=LEASE_TTL_SECONDS):
+    """
+    Acquire or renew the lease called `name`.
+    Succeeds if nobody holds it, we already hold it, or the current holder stopped renewing.
+    Returns True if `holder` owns the lease afterwards.
+    """
+    with get_session() as session:
+        now = _server_utcnow(session)
+        expires_at = _server_utcnow(session, int(ttl))
+        # A single conditional UPDATE is atomic on both MariaDB and SQLite, so only one
+        # contender can flip an expired lease over to itself
+        result = session.execute(
+            update(LeaderLease)
+            .where(LeaderLease.name == name)
+            .where(or_(
+                LeaderLease.holder == holder,
+                LeaderLease.holder.is_(None),
+                LeaderLease.expires_at < now
+            ))
+            .values(holder=holder, expires_at=expires_at, renewed_at=now)
+        )
+        if result.rowcount == 1:
+            session.commit()
+            return True
+        session.rollback()
+
+        if session.get(LeaderLease, name) is not None:
+            return False  # Held by another live instance
+
+        # First time this lease is used; the primary key makes concurrent inserts safe
+        session.add(LeaderLease(name=name, holder=holder, expires_at=expires_at, renewed_at=now))
+        try:
+            session.commit()
+            return True
+        except IntegrityError:
+            session.rollback()
+            return False
+
+
+def release_lease(name, holder=INSTANCE_ID):
+    """Give up the lease so another instance can take over without waiting for expiry."""
+    with get_session() as session:
+        session.execute(
+            update(LeaderLease)
+            .where(LeaderLease.name == name, LeaderLease.holder == holder)
+            .values(holder=None, expires_at=_server_utcnow(session))
+        )
+        session.commit()
+
+
+class LeaderElector:
+    """
+    Keeps one lease per scheduled job and renews the ones this process holds from a heartbeat thread.
+    Every replica runs the same scheduler, but jobs wrapped with `leader_only` only do work on the
+    replica that currently holds that job's lease.
+    """
+
+    def __init__(self, names, ttl=LEASE_TTL_SECONDS, holder=INSTANCE_ID):
+        self.names = list(names)
+        self.ttl = ttl
+        self.holder = holder
+        # name -> monotonic deadline after which we can no longer assume we hold the lease
+        self._held = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self.heartbeat()
+        self._thread = threading.Thread(target=self._run, name="leader-elector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            held = list(self._held)
+            self._held.clear()
+        for name in held:
+            try:
+                release_lease(name, self.holder)
+            except Exception as e:
+                print(f"Failed to release lease {name}: {e}")
+
+    def heartbeat(self):
+        """Renew held leases and try to take over any lease whose holder stopped renewing."""
+        for name in self.names:
+            started = time.monotonic()
+            try:
+                acquired = try_acquire_lease(name, self.holder, self.ttl)
+            except Exception as e:
+                # Keep the local deadline; if the DB stays unreachable the lease simply runs out
+                print(f"Lease heartbeat for {name} failed: {e}")
+                continue
+            with self._lock:
+                was_leader = name in self._held
+                if acquired:
+                    self._held[name] = started + self.ttl
+                else:
+                    self._held.pop(name, None)
+            if acquired and not was_leader:
+                print(f"{self.holder} is now leader for {name}")
+            elif was_leader and not acquired:
+                print(f"{self.holder} lost leadership for {name}")
+
+    def is_leader(self, name):
+        with self._lock:
+            deadline = self._held.get(name)
+        return deadline is not None and time.monotonic() < deadline
+
+    def leader_only(self, name, task):
+        """Wrap `task` so it only runs on the instance holding the `name` lease."""
+        def run(*args, **kwargs):
+            if not self.is_leader(name):
+                print(f"Skipping {name}: another instance holds the lease")
+                return None
+            return task(*args, **kwargs)
+
+        run.__name__ = getattr(task, "__name__", name)
+        return run
+
+    def _run(self):
+        while not self._stop.wait(self.ttl / 3):
+            self.heartbeat()
@@ -0,0 +1,291 @@
+"""
+Read-only SQLite snapshot of the tables the API reads.
+
+After each import the live tables are copied into a compact local file: permits denormalized with their
+address, contractors, and per-contractor aggregates, all behind covering indexes. The API opens it with
+`immutable=1` and mmap, so reads are local-disk speed and never wait on importer row locks.
+A rebuilt file is swapped in with os.replace; readers notice the new inode on their next query.
+
+Enabled by setting API_SNAPSHOT_PATH.
+"""
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import select
+
+from database.db_address import Address, ApprovedPermit, Contractor, get_session
+
+try:
+    import fcntl
+except ImportError:  # Windows; workers on one host may then build the same snapshot concurrently
+    fcntl = None
+
+SNAPSHOT_PATH = os.getenv("API_SNAPSHOT_PATH")
+SNAPSHOT_MMAP_BYTES = int(os.getenv("API_SNAPSHOT_MMAP_BYTES", 1 << 30))
+
+PERMIT_COLUMNS = [column.key for column in ApprovedPermit.__table__.columns]
+ADDRESS_COLUMNS = ["street_number", "street_name", "city", "state", "zipcode", "latitude", "longitude"]
+CONTRACTOR_COLUMNS = ["id", "license_id", "company", "name", "license_status", "expire_date"]
+
+
+def _version_key(version):
+    return "|".join(ts.isoformat() for ts in version)
+
+
+def _sqlite_type(column):
+    python_type = column.type.python_type
+    if python_type is int:
+        return "INTEGER"
+    if python_type is float:
+        return "REAL"
+    return "TEXT"
+
+
+def _create_schema(conn):
+    permit_columns = ", ".join(f"{column.key} {_sqlite_type(column)}" for column in ApprovedPermit.__table__.columns)
+    address_columns = ", ".join(
+        f"address_{name} {_sqlite_type(Address.__table__.columns[name])}" for name in ADDRESS_COLUMNS
+    )
+    conn.executescript(f"""
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+        CREATE TABLE permits ({permit_columns}, {address_columns});
+        CREATE TABLE contractors (
+            id INTEGER PRIMARY KEY, license_id TEXT, company TEXT, name TEXT, license_status TEXT, expire_date TEXT
+        );
+        CREATE TABLE contractor_stats (
+            contractor_name TEXT PRIMARY KEY, permit_count INTEGER, total_amount REAL,
+            first_permit TEXT, last_permit TEXT
+        ) WITHOUT ROWID;
+        CREATE TABLE contractor_totals (
+            contractor_id INTEGER PRIMARY KEY, permit_count INTEGER, total_amount REAL
+        );
+    """)
+
+
+def _create_indexes(conn):
+    conn.executescript("""
+        CREATE INDEX permits_by_contractor_id ON permits (contractor_id, project_id);
+        CREATE INDEX permits_by_contractor ON permits (contractor_name, project_id);
+        CREATE INDEX contractors_by_name ON contractors (name, license_id, id);
+        CREATE UNIQUE INDEX contractors_by_license ON contractors (license_id, name, id);
+        INSERT INTO contractor_stats
+            SELECT contractor_name, count(*), sum(project_amount), min(date_started), max(date_started)
+            FROM permits WHERE contractor_name IS NOT NULL GROUP BY contractor_name;
+        INSERT INTO contractor_totals
+            SELECT contractor_id, count(*), sum(project_amount)
+            FROM permits WHERE contractor_id IS NOT NULL GROUP BY contractor_id;
+        ANALYZE;
+    """)
+
+
+def build_snapshot(path=SNAPSHOT_PATH, version=None, batch_size=5000):
+    """Copy the live tables into a fresh snapshot file and atomically replace `path` with it."""
+    started = time.perf_counter()
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        # Nothing reads the file until it is complete, so skip journaling entirely
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        _create_schema(conn)
+
+        permit_fields = [getattr(ApprovedPermit, name) for name in PERMIT_COLUMNS]
+        address_fields = [getattr(Address, name) for name in ADDRESS_COLUMNS]
+        placeholders = ", ".join("?" * (len(permit_fields) + len(address_fields)))
+        with get_session() as session:
+            # Ordered by contractor so each contractor's permits sit next to each other in the file
+            rows = session.execute(
+                select(*permit_fields, *address_fields)
+                .outerjoin(Address, ApprovedPermit.project_address_id == Address.id)
+                .order_by(ApprovedPermit.contractor_id, ApprovedPermit.contractor_name, ApprovedPermit.project_id)
+                .execution_options(yield_per=batch_size)
+            )
+            for batch in rows.partitions(batch_size):
+                conn.executemany(f"INSERT INTO permits VALUES ({placeholders})", [tuple(row) for row in batch])
+
+            contractors = session.execute(
+                select(*[getattr(Contractor, name) for name in CONTRACTOR_COLUMNS]).execution_options(yield_per=batch_size)
+            )
+            for batch in contractors.partitions(batch_size):
+                conn.executemany(
+                    "INSERT INTO contractors VALUES (?, ?, ?, ?, ?, ?)",
+                    [tuple(row[:-1]) + (row[-1].isoformat() if row[-1] else None,) for row in batch]
+                )
+
+        _create_indexes(conn)
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("data_version", _version_key(version) if version else ""),
+            ("built_at", datetime.datetime.utcnow().isoformat()),
+        ])
+        conn.commit()
+    except Exception:
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    conn.close()
+
+    os.replace(tmp_path, path)
+    print(f"Built API snapshot {path} in {time.perf_counter() - started:.1f}s")
+    return path
+
+
+class SnapshotReader:
+    """Queries against the snapshot file. Each thread keeps its own connection and reopens it after a swap."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        inode = os.stat(self.path).st_ino
+        local = self._local
+        if getattr(local, "inode", None) != inode:
+            if getattr(local, "conn", None) is not None:
+                local.conn.close()
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size={SNAPSHOT_MMAP_BYTES}")
+            conn.row_factory = sqlite3.Row
+            local.conn, local.inode = conn, inode
+        return local.conn
+
+    def data_version(self):
+        row = self._connection().execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()
+        return row["value"] if row else None
+
+    def find_contractor(self, name=None, license_id=None):
+        if license_id is not None:
+            row = self._connection().execute(
+                "SELECT * FROM contractors WHERE license_id = ? LIMIT 1", (license_id,)
+            ).fetchone()
+        else:
+            row = self._connection().execute("SELECT * FROM contractors WHERE name = ? LIMIT 1", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def contractor_name_candidates(self, fragment, limit=50):
+        """Distinct permit applicant names containing `fragment`, falling back to any names like the live query."""
+        conn = self._connection()
+        rows = conn.execute(
+            "SELECT contractor_name FROM contractor_stats WHERE contractor_name LIKE ? LIMIT ?", (f"%{fragment}%", limit)
+        ).fetchall()
+        if not rows:
+            rows = conn.execute("SELECT contractor_name FROM contractor_stats LIMIT ?", (limit,)).fetchall()
+        return [row["contractor_name"] for row in rows]
+
+    def _permits_where(self, column, value):
+        rows = self._connection().execute(
+            f"SELECT {', '.join(PERMIT_COLUMNS)} FROM permits WHERE {column} = ? AND address_city IS NOT NULL "
+            "ORDER BY project_id",
+            (value,)
+        )
+        return [dict(row) for row in rows]
+
+    def permits_for_contractor(self, contractor_id, contractor_name):
+        """Permits linked to the contractor, falling back to the applicant name like the live query."""
+        return self._permits_where("contractor_id", contractor_id) or self._permits_where("contractor_name", contractor_name)
+
+    def total_amount(self, contractor_id, contractor_name):
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT total_amount FROM contractor_totals WHERE contractor_id = ?", (contractor_id,)
+        ).fetchone()
+        if row is None:
+            row = conn.execute(
+                "SELECT total_amount FROM contractor_stats WHERE contractor_name = ?", (contractor_name,)
+            ).fetchone()
+        return row["total_amount"] if row else None
+
+    def _select_in(self, sql, column, values):
+        if not values:
+            return []
+        placeholders = ", ".join("?" * len(values))
+        return self._connection().execute(sql.format(where=f"{column} IN ({placeholders})"), list(values)).fetchall()
+
+    def find_contractors(self, license_ids=(), names=()):
+        """Contractors matching any of `license_ids` or `names`, lowest id first."""
+        rows = self._select_in("SELECT * FROM contractors WHERE {where}", "license_id", license_ids)
+        rows += self._select_in("SELECT * FROM contractors WHERE {where}", "name", names)
+        unique = {row["id"]: dict(row) for row in rows}
+        return [unique[contractor_id] for contractor_id in sorted(unique)]
+
+    def permits_for_contractors(self, contractors):
+        """Like permits_for_contractor for several contractors at once: {contractor id: permits}."""
+        sql = (f"SELECT {', '.join(PERMIT_COLUMNS)} FROM permits WHERE {{where}} AND address_city IS NOT NULL "
+               "ORDER BY project_id")
+        by_id = {contractor["id"]: [] for contractor in contractors}
+        for row in self._select_in(sql, "contractor_id", list(by_id)):
+            by_id[row["contractor_id"]].append(dict(row))
+
+        unlinked = {contractor["name"] for contractor in contractors if not by_id[contractor["id"]]}
+        by_name = {}
+        for row in self._select_in(sql, "contractor_name", list(unlinked)):
+            by_name.setdefault(row["contractor_name"], []).append(dict(row))
+        for contractor in contractors:
+            if not by_id[contractor["id"]]:
+                by_id[contractor["id"]] = by_name.get(contractor["name"], [])
+        return by_id
+
+    def total_amounts(self, contractors):
+        """Like total_amount for several contractors at once: {contractor id: total}."""
+        by_id = {
+            row["contractor_id"]: row["total_amount"]
+            for row in self._select_in("SELECT * FROM contractor_totals WHERE {where}", "contractor_id",
+                                       [contractor["id"] for contractor in contractors])
+        }
+        unlinked = {contractor["name"] for contractor in contractors if contractor["id"] not in by_id}
+        by_name = {
+            row["contractor_name"]: row["total_amount"]
+            for row in self._select_in("SELECT * FROM contractor_stats WHERE {where}", "contractor_name", list(unlinked))
+        }
+        return {
+            contractor["id"]: by_id[contractor["id"]] if contractor["id"] in by_id else by_name.get(contractor["name"])
+            for contractor in contractors
+        }
+
+
+_reader = None
+_refresh_lock = threading.Lock()
+_refresh_thread = None
+
+
+def _refresh(path, version):
+    lock_file = open(f"{path}.lock", "w")
+    try:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # Another worker on this host is already building it
+        reader = SnapshotReader(path)
+        if os.path.exists(path) and reader.data_version() == _version_key(version):
+            return  # Built by another worker while we waited
+        build_snapshot(path, version)
+    except Exception as e:
+        print(f"Failed to build API snapshot: {e}")
+    finally:
+        lock_file.close()
+
+
+def get_snapshot(version, path=SNAPSHOT_PATH):
+    """
+    Return a reader if snapshots are enabled and the snapshot matches `version` (the State import timestamps).
+    Otherwise start a background rebuild and return None, so the caller reads the live tables meanwhile.
+    """
+    global _reader, _refresh_thread
+    if not path:
+        return None
+    if _reader is None or _reader.path != path:
+        _reader = SnapshotReader(path)
+    if os.path.exists(path) and _reader.data_version() == _version_key(version):
+        return _reader
+
+    with _refresh_lock:
+        if _refresh_thread is None or not _refresh_thread.is_alive():
+            _refresh_thread = threading.Thread(target=_refresh, args=(path, version), name="api-snapshot", daemon=True)
+            _refresh_thread.start()
+    return None
@@ -2,43 +2,37 @@ from dotenv import load_dotenv
 # Load environment variables from .env
 load_dotenv()
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from database import Contractor, Address, ApprovedPermit
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from datetime import datetime
 from contextlib import asynccontextmanager
+import asyncio
 import database
 import api
+import metrics
 import os
-import requests
-from bs4 import BeautifulSoup
-from data_importers import update_permits_table_task, update_contractor_table_task
+from api.autocomplete import contractor_index
+from api.caching import current_data_version
+from database.snapshot import get_snapshot
 
 def get_bool_env_var(key, default=False):
     return os.environ.get(key, str(default)).lower() in ('true', '1', 'yes')
 
-# Read database credentials from environment variables
-SQL_HOST = os.getenv("SQL_HOST")
-SQL_PORT = os.getenv("SQL_PORT", 3306)  # Default to 3306 if not specified
-SQL_USER = os.getenv("SQL_USER")
-SQL_PASSWORD = os.getenv("SQL_PASSWORD")
-SQL_DATABASE = os.getenv("SQL_DATABASE")
 SQL_ALCHEMY_DEBUG = get_bool_env_var("SQL_ALCHEMY_DEBUG", False)
+# Build the in-memory search indexes during startup instead of on the first request that needs them
+STARTUP_WARMUP = get_bool_env_var("STARTUP_WARMUP", False)
 
-# Construct the MariaDB connection URL
-DATABASE_URL = (
-    f"mysql+pymysql://{SQL_USER}:{SQL_PASSWORD}@{SQL_HOST}:{SQL_PORT}/{SQL_DATABASE}"
-)
-
-# Get DB Engine
-engine = create_engine(DATABASE_URL, echo=SQL_ALCHEMY_DEBUG)
-
-# Create all tables based on our models
-database.init(engine)
+# Get DB Engine: DATABASE_URL, or MariaDB from the SQL_* variables, or a local SQLite file from SQLITE_PATH.
+# Creating it doesn't connect; the first connection is made by database.init in the lifespan.
+engine = database.create_db_engine(echo=SQL_ALCHEMY_DEBUG)
+metrics.instrument_engine(engine)
+if metrics.QUERY_TRACE_MODE != "off":
+    # Opt-in per-request SQL tracing, see metrics/query_trace.py
+    metrics.enable_query_tracing(engine)
 
 # Create a session factory
 SessionLocal = sessionmaker(bind=engine)
@@ -50,13 +44,45 @@ def get_session():
 # Initialize Scheduler
 scheduler = AsyncIOScheduler()
 
+# Every worker/pod runs the scheduler, but only the holder of a job's lease actually imports
+leader_elector = database.LeaderElector(["mass_contractor_import", "boston_permits_import"])
+
+
+# The importers pull in requests, bs4 and dateutil, so they're only imported once a job actually runs
+def update_contractor_table_job():
+    from data_importers import update_contractor_table_task
+    return update_contractor_table_task()
+
+
+def update_permits_table_job():
+    from data_importers import update_permits_table_task
+    return update_permits_table_task()
+
+
+def warm_up():
+    """Build the contractor prefix index, permit grid and analytics columns, and start the API snapshot build if it's enabled."""
+    from api.analytics import permit_columns  # Loads pandas and numpy
+    from api.geo import permit_grid  # Loads numpy
+
+    version = current_data_version()
+    contractor_index.get(version)
+    permit_grid.get(version)
+    permit_columns.get(version)
+    get_snapshot(version)
+
 
 # Lifespan context for handling startup and shutdown
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup actions
-    scheduler.add_job(update_contractor_table_task, trigger="interval", hours=12)
-    scheduler.add_job(update_permits_table_task, trigger="interval", hours=12)
+    # Create all tables based on our models
+    database.init(engine)
+    if STARTUP_WARMUP:
+        await asyncio.to_thread(warm_up)
+        print("Search indexes warmed up.")
+    leader_elector.start()
+    scheduler.add_job(leader_elector.leader_only("mass_contractor_import", update_contractor_table_job), trigger="interval", hours=12)
+    scheduler.add_job(leader_elector.leader_only("boston_permits_import", update_permits_table_job), trigger="interval", hours=12)
     scheduler.start()
     print("Scheduler started with FastAPI lifespan event.")
 
@@ -64,6 +90,7 @@ async def lifespan(app: FastAPI):
 
     # Shutdown actions
     scheduler.shutdown()
+    leader_elector.stop()
     print("Scheduler shut down gracefully.")
 
 # Get FastAPI
@@ -75,12 +102,20 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+if metrics.QUERY_TRACE_MODE != "off":
+    app.add_middleware(metrics.QueryTraceMiddleware)
 app.include_router(api.router, prefix="/api")
 
 @app.get("/health")
 async def health():
     return 200
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    body, content_type = metrics.render_metrics()
+    return Response(content=body, media_type=content_type)
+
 if __name__ == '__main__':
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8003)
\ No newline at end of file
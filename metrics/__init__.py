@@ -0,0 +1,7 @@
+from .instrumentation import MetricsMiddleware, ImportStats, instrument_engine, track_openai_call, render_metrics
+from .query_trace import QUERY_TRACE_MODE, QueryTraceMiddleware, enable_query_tracing, trace_queries, assert_max_queries
+
+__all__ = [
+    "MetricsMiddleware", "ImportStats", "instrument_engine", "track_openai_call", "render_metrics",
+    "QUERY_TRACE_MODE", "QueryTraceMiddleware", "enable_query_tracing", "trace_queries", "assert_max_queries",
+]
\ No newline at end of file
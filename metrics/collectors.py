@@ -0,0 +1,77 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Buckets tuned for an API whose fast paths are a few ms and whose GPT-backed path takes seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent handling a request",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Duration of individual SQL statements",
+    buckets=LATENCY_BUCKETS
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements executed while handling a request",
+    ["route"], buckets=QUERY_COUNT_BUCKETS
+)
+DB_QUERY_TIME_PER_REQUEST = Histogram(
+    "db_query_seconds_per_request", "Total SQL time spent while handling a request",
+    ["route"], buckets=LATENCY_BUCKETS
+)
+DB_POOL_CONNECTIONS_IN_USE = Gauge(
+    "db_pool_connections_in_use", "Pooled connections currently checked out",
+    multiprocess_mode="livesum"
+)
+DB_POOL_CONNECTION_HOLD = Histogram(
+    "db_pool_connection_hold_seconds", "Time a connection stays checked out of the pool",
+    buckets=LATENCY_BUCKETS
+)
+DB_POOL_CONNECT_DURATION = Histogram(
+    "db_pool_connect_seconds", "Time spent opening a new database connection for the pool",
+    buckets=LATENCY_BUCKETS
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time a checkout waited for a connection from the pool, including opening one",
+    buckets=LATENCY_BUCKETS
+)
+DB_POOL_SATURATED_CHECKOUTS = Counter(
+    "db_pool_saturated_checkouts_total",
+    "Checkouts that found every pooled and overflow connection in use and waited for one to be returned"
+)
+
+OPENAI_REQUEST_DURATION = Histogram(
+    "openai_request_duration_seconds", "Latency of OpenAI chat completion calls",
+    ["model", "outcome"], buckets=LATENCY_BUCKETS
+)
+OPENAI_TOKENS = Counter(
+    "openai_tokens_total", "Tokens used by OpenAI chat completion calls",
+    ["model", "kind"]
+)
+OPENAI_IN_FLIGHT = Gauge(
+    "openai_requests_in_flight", "OpenAI chat completion calls currently running",
+    ["model"]
+)
+OPENAI_COALESCED = Counter(
+    "openai_coalesced_requests_total", "Completions answered by joining an identical call already in flight",
+    ["model"]
+)
+
+IMPORTER_ROWS = Counter(
+    "importer_rows_total", "Rows handled by the data importers",
+    ["importer", "outcome"]
+)
+IMPORTER_ROWS_PER_SECOND = Gauge(
+    "importer_rows_per_second", "Throughput of the last completed import",
+    ["importer"]
+)
+IMPORTER_PHASE_DURATION = Gauge(
+    "importer_phase_duration_seconds", "Duration of each phase of the last completed import",
+    ["importer", "phase"]
+)
+IMPORTER_LAST_SUCCESS = Gauge(
+    "importer_last_success_timestamp_seconds", "Unix time the importer last finished",
+    ["importer"]
+)
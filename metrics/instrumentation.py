@@ -0,0 +1,190 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from database.engine import POOL_WAIT_INFO_KEY
+from metrics.collectors import (
+    HTTP_REQUEST_DURATION, DB_QUERY_DURATION, DB_QUERIES_PER_REQUEST, DB_QUERY_TIME_PER_REQUEST,
+    DB_POOL_CONNECTIONS_IN_USE, DB_POOL_CONNECTION_HOLD, DB_POOL_CONNECT_DURATION, DB_POOL_CHECKOUT_WAIT,
+    DB_POOL_SATURATED_CHECKOUTS,
+    OPENAI_REQUEST_DURATION, OPENAI_TOKENS, IMPORTER_ROWS, IMPORTER_ROWS_PER_SECOND,
+    IMPORTER_PHASE_DURATION, IMPORTER_LAST_SUCCESS
+)
+
+
+class RequestStats:
+    """SQL work done on behalf of the current request. Mutated in place, so threadpool copies of the context share it."""
+    __slots__ = ("queries", "query_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+current_request_stats = contextvars.ContextVar("current_request_stats", default=None)
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (cheaper than BaseHTTPMiddleware) recording latency and SQL usage per route.
+    Routes are labelled by their path template so query strings and ids don't explode cardinality.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request_stats.reset(token)
+            route = scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, status).observe(elapsed)
+            DB_QUERIES_PER_REQUEST.labels(route).observe(stats.queries)
+            DB_QUERY_TIME_PER_REQUEST.labels(route).observe(stats.query_seconds)
+
+
+def instrument_engine(engine):
+    """Record statement durations, per-request query counts and connection pool usage for `engine`."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERY_DURATION.observe(elapsed)
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += elapsed
+
+    # Pool events registered on the engine carry over to the new pool after engine.dispose()
+    @event.listens_for(engine, "do_connect")
+    def before_connect(dialect, connection_record, cargs, cparams):
+        connection_record.info["connect_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "connect")
+    def after_connect(dbapi_connection, connection_record):
+        started = connection_record.info.pop("connect_started", None)
+        if started is not None:
+            DB_POOL_CONNECT_DURATION.observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        DB_POOL_CONNECTIONS_IN_USE.inc()
+        # Recorded by database.engine.TimedQueuePool; in-memory SQLite pools never wait
+        wait = connection_record.info.pop(POOL_WAIT_INFO_KEY, None)
+        if wait is not None:
+            seconds, saturated = wait
+            DB_POOL_CHECKOUT_WAIT.observe(seconds)
+            if saturated:
+                DB_POOL_SATURATED_CHECKOUTS.inc()
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            DB_POOL_CONNECTIONS_IN_USE.dec()
+            DB_POOL_CONNECTION_HOLD.observe(time.perf_counter() - checked_out_at)
+
+    return engine
+
+
+@contextmanager
+def track_openai_call(model):
+    """
+    Time an OpenAI call. Yields a dict; set `response` in it to also count tokens.
+
+        with track_openai_call("gpt-4o") as call:
+            call["response"] = client.chat.completions.create(...)
+    """
+    call = {}
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield call
+        outcome = "ok"
+    finally:
+        OPENAI_REQUEST_DURATION.labels(model, outcome).observe(time.perf_counter() - started)
+        usage = getattr(call.get("response"), "usage", None)
+        if usage is not None:
+            OPENAI_TOKENS.labels(model, "prompt").inc(usage.prompt_tokens or 0)
+            OPENAI_TOKENS.labels(model, "completion").inc(usage.completion_tokens or 0)
+
+
+class ImportStats:
+    """
+    Counters for one importer. Call `row()` per processed row, wrap work in `phase()`,
+    then `finish()` to publish throughput and phase durations of the run.
+    """
+    # "skipped" rows were left out on purpose (e.g. missing required fields), "failed" ones hit an error
+    OUTCOMES = ("read", "inserted", "updated", "skipped", "failed")
+
+    def __init__(self, importer):
+        self.importer = importer
+        self._counters = {outcome: IMPORTER_ROWS.labels(importer, outcome) for outcome in self.OUTCOMES}
+        self.reset()
+
+    def reset(self):
+        self.rows_read = 0
+        self.phases = {}
+        self.started = time.perf_counter()
+
+    def row(self, outcome):
+        self._counters[outcome].inc()
+        if outcome == "read":
+            self.rows_read += 1
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def finish(self):
+        elapsed = time.perf_counter() - self.started
+        if elapsed > 0:
+            IMPORTER_ROWS_PER_SECOND.labels(self.importer).set(self.rows_read / elapsed)
+        for name, seconds in self.phases.items():
+            IMPORTER_PHASE_DURATION.labels(self.importer, name).set(seconds)
+        IMPORTER_LAST_SUCCESS.labels(self.importer).set_to_current_time()
+        print(f"{self.importer}: {self.rows_read} rows in {elapsed:.1f}s "
+              f"({', '.join(f'{name} {seconds:.1f}s' for name, seconds in self.phases.items())})")
+
+
+def render_metrics():
+    """Return (body, content_type) for the /metrics endpoint, aggregating worker processes when configured."""
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, REGISTRY, generate_latest
+
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,166 @@
+"""
+Opt-in per-request SQL tracing.
+
+QUERY_TRACE=all traces every request, QUERY_TRACE=header only requests sent with `X-Query-Trace: 1`.
+Traced responses carry X-Query-Count / X-Query-Time-Ms / X-Query-Repeated / X-Query-Slow headers and a
+summary is printed for requests with repeated statement shapes (likely N+1) or slow statements.
+"""
+import contextvars
+import os
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+QUERY_TRACE_MODE = os.getenv("QUERY_TRACE", "off").lower()  # off | header | all
+SLOW_QUERY_MS = float(os.getenv("QUERY_TRACE_SLOW_MS", 100))
+# The same statement shape this many times in one request is reported as a likely N+1
+REPEATED_QUERY_THRESHOLD = int(os.getenv("QUERY_TRACE_REPEAT_THRESHOLD", 5))
+
+TRACE_HEADER = "x-query-trace"
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\bIN\s*\((?:[^()]*)\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement):
+    """Reduce a statement to its shape, so the same query with different values groups together."""
+    shape = _LITERALS.sub("?", statement)
+    shape = _IN_LISTS.sub("IN (...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def _call_site():
+    """First frame in project code (outside SQLAlchemy and this module) that led to the statement."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(PROJECT_ROOT) and filename != __file__ and "site-packages" not in filename:
+            return f"{os.path.relpath(filename, PROJECT_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+class QueryTrace:
+    def __init__(self):
+        self.queries = []  # (statement, seconds, call_site)
+
+    def record(self, statement, seconds, call_site):
+        self.queries.append((statement, seconds, call_site))
+
+    @property
+    def total_seconds(self):
+        return sum(seconds for _, seconds, _ in self.queries)
+
+    def repeated(self, threshold=REPEATED_QUERY_THRESHOLD):
+        """Statement shapes executed at least `threshold` times, with the call sites that ran them."""
+        counts = Counter(statement_shape(statement) for statement, _, _ in self.queries)
+        repeated = {}
+        for statement, _, call_site in self.queries:
+            shape = statement_shape(statement)
+            if counts[shape] >= threshold:
+                repeated.setdefault(shape, {"count": counts[shape], "call_sites": set()})["call_sites"].add(call_site)
+        return repeated
+
+    def slow(self, threshold_ms=SLOW_QUERY_MS):
+        return [query for query in self.queries if query[1] * 1000 >= threshold_ms]
+
+    def summary(self):
+        lines = [f"{len(self.queries)} queries, {self.total_seconds * 1000:.1f} ms total"]
+        for shape, info in self.repeated().items():
+            lines.append(f"  repeated x{info['count']} from {', '.join(sorted(info['call_sites']))}: {shape[:200]}")
+        for statement, seconds, call_site in self.slow():
+            lines.append(f"  slow {seconds * 1000:.1f} ms at {call_site}: {statement_shape(statement)[:200]}")
+        return "\n".join(lines)
+
+
+current_trace = contextvars.ContextVar("current_query_trace", default=None)
+
+
+def enable_query_tracing(engine):
+    """Record statements on `engine` into the active QueryTrace, if any. Costs one context lookup per query otherwise."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_trace.get() is not None:
+            conn.info.setdefault("trace_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        trace = current_trace.get()
+        if trace is not None and conn.info.get("trace_started"):
+            trace.record(statement, time.perf_counter() - conn.info["trace_started"].pop(), _call_site())
+
+    return engine
+
+
+@contextmanager
+def trace_queries():
+    """Trace statements run in the current context (same thread or asyncio task)."""
+    trace = QueryTrace()
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        current_trace.reset(token)
+
+
+class QueryTraceMiddleware:
+    """ASGI middleware that traces requests according to QUERY_TRACE and reports through headers and stdout."""
+
+    def __init__(self, app, mode=None):
+        self.app = app
+        self.mode = mode or QUERY_TRACE_MODE
+
+    def _should_trace(self, scope):
+        if scope["type"] != "http" or self.mode == "off":
+            return False
+        if self.mode == "all":
+            return True
+        return any(name == TRACE_HEADER.encode() and value == b"1" for name, value in scope["headers"])
+
+    async def __call__(self, scope, receive, send):
+        if not self._should_trace(scope):
+            await self.app(scope, receive, send)
+            return
+
+        with trace_queries() as trace:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers += [
+                        (b"x-query-count", str(len(trace.queries)).encode()),
+                        (b"x-query-time-ms", f"{trace.total_seconds * 1000:.1f}".encode()),
+                        (b"x-query-repeated", str(sum(info["count"] for info in trace.repeated().values())).encode()),
+                        (b"x-query-slow", str(len(trace.slow())).encode()),
+                    ]
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+        if trace.repeated() or trace.slow():
+            print(f"Query trace for {scope['method']} {scope['path']}: {trace.summary()}")
+
+
+def assert_max_queries(client, url, max_queries, method="GET", **kwargs):
+    """
+    pytest helper: request `url` through a TestClient/httpx client with tracing on and fail if it ran
+    more than `max_queries` statements. The app must include QueryTraceMiddleware (QUERY_TRACE=header).
+
+        assert_max_queries(client, "/api/detailed-contractor?license_id=123", max_queries=3)
+    """
+    headers = {**kwargs.pop("headers", {}), TRACE_HEADER: "1"}
+    response = client.request(method, url, headers=headers, **kwargs)
+    count = response.headers.get("x-query-count")
+    assert count is not None, "Query tracing is not active; add QueryTraceMiddleware with QUERY_TRACE=header"
+    assert int(count) <= max_queries, (
+        f"{method} {url} ran {count} queries, expected at most {max_queries} "
+        f"({response.headers.get('x-query-repeated')} in repeated shapes)"
+    )
+    return response
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import database
+
+
+@pytest.fixture
+def sqlite_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'test.db'}"
+
+
+@pytest.fixture
+def engine(sqlite_url):
+    """A fresh, initialized SQLite database, installed as the app's engine."""
+    engine_ref = database.create_db_engine(sqlite_url)
+    database.init(engine_ref)
+    yield engine_ref
+    engine_ref.dispose()
+
+
+@pytest.fixture
+def client(engine, monkeypatch):
+    """
+    An API client on `engine` with the data version re-read on every request, empty caches and a stubbed
+    gpt_search.
+    """
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    import api
+    from api import analytics, autocomplete, caching, geo
+
+    monkeypatch.setattr(caching, "DATA_VERSION_TTL_SECONDS", 0)
+    monkeypatch.setattr(caching, "response_cache", caching.ResponseCache())
+    monkeypatch.setattr(api.endpoints, "response_cache", caching.response_cache)
+    for cache in (autocomplete.contractor_index, geo.permit_grid, analytics.permit_columns):
+        monkeypatch.setattr(cache, "_value", None)
+        monkeypatch.setattr(cache, "_version", None)
+
+    async def fake_gpt_search(query):
+        return "Test verdict."
+
+    monkeypatch.setattr(api.endpoints, "gpt_search", fake_gpt_search)
+
+    app = FastAPI()
+    app.include_router(api.router, prefix="/api")
+    with TestClient(app) as test_client:
+        yield test_client
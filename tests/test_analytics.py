@@ -0,0 +1,53 @@
+import asyncio
+
+from api import analytics
+from api.analytics import PermitColumns
+from benchmarks.api_load_test import seed_database
+from database import ApprovedPermit, get_session, mark_imported
+
+
+def test_last_permit_is_the_latest_date_in_any_order():
+    dates = ["2023-05-01 00:00:00", None, "2021-01-01 00:00:00", "2024-02-03 00:00:00", "2022-07-01 00:00:00"]
+    columns = PermitColumns(["a", "a", "a", "b", "a"], [None] * 5, [1, 2, 3, 4, 5], dates, [None] * 5, [None] * 5)
+    last = {row["contractor_name"]: row["last_permit"] for row in columns.top_contractors()}
+    assert last == {"a": "2023-05-01 00:00:00", "b": "2024-02-03 00:00:00"}
+
+    undated = PermitColumns(["a"], [None], [1], [None], [None], [None])
+    assert undated.top_contractors()[0]["last_permit"] is None
+
+
+def test_dashboards_reflect_an_import_right_away(engine, client):
+    seed_database(engine, 5, 50)
+    assert client.get("/api/analytics/top-contractors").status_code == 200
+
+    with get_session() as session:
+        session.add_all([
+            ApprovedPermit(permit_id=f"new{i}", contractor_name="jozef newcomer", project_amount=1000,
+                           date_started="2024-01-01 00:00:00")
+            for i in range(100)
+        ])
+        session.commit()
+    mark_imported("boston_permits_update_ts")
+
+    top = client.get("/api/analytics/top-contractors").json()["contractors"][0]
+    assert top["contractor_name"] == "jozef newcomer"
+    assert top["permits"] == 100
+
+
+def test_columns_build_runs_off_the_event_loop(engine, client, monkeypatch):
+    seed_database(engine, 5, 50)
+    build = analytics.permit_columns.build
+    on_event_loop = []
+
+    def recording_build():
+        try:
+            asyncio.get_running_loop()
+            on_event_loop.append(True)
+        except RuntimeError:
+            on_event_loop.append(False)
+        return build()
+
+    monkeypatch.setattr(analytics.permit_columns, "build", recording_build)
+    for path in ("top-contractors", "contractor-years", "value-distribution"):
+        assert client.get(f"/api/analytics/{path}").status_code == 200
+    assert on_event_loop == [False]
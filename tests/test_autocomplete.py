@@ -0,0 +1,35 @@
+from api.autocomplete import contractor_index
+from benchmarks.api_load_test import seed_database
+from database import Contractor, get_session, mark_imported
+
+
+def wait_for_rebuild(cache):
+    if cache._refresh_thread is not None:
+        cache._refresh_thread.join()
+
+
+def search(client, query):
+    response = client.get("/api/fuzzy-contractor", params={"contractor_name": query})
+    assert response.status_code == 200
+    return [result["name"] for result in response.json()], response.headers.get("ETag")
+
+
+def test_short_queries_see_contractors_added_by_an_import(engine, client):
+    seed_database(engine, 5, 50)
+    search(client, "joze")
+    wait_for_rebuild(contractor_index)
+    assert search(client, "joze")[0] == []
+
+    with get_session() as session:
+        session.add(Contractor(license_id="999", name="jozef newcomer", license_status="active"))
+        session.commit()
+    mark_imported("mass_contractor_update_ts")
+
+    # While the index is rebuilt the answer comes from the table and isn't cached under the new ETag
+    names, etag = search(client, "joze")
+    assert names == ["Jozef Newcomer"]
+    assert etag is None
+    wait_for_rebuild(contractor_index)
+    names, etag = search(client, "joze")
+    assert names == ["Jozef Newcomer"]
+    assert etag is not None
@@ -0,0 +1,60 @@
+import csv
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from data_importers import columnar_cache
+from data_importers.boston_importer import (
+    PERMIT_COLUMNS, PERMIT_FLOAT_COLUMNS, PERMIT_TIMESTAMP_COLUMNS, parse_permit_row,
+)
+
+ROW = {
+    "address": "1 main st", "city": "boston", "state": "ma", "zip": "02118", "occupancytype": "1-2fam",
+    "y_latitude": "42.35", "x_longitude": "-71.06", "permitnumber": "alt1", "issued_date": "2023-05-01 00:00:00",
+    "declared_valuation": "$1,234.56", "status": "open", "applicant": "someone", "description": "roofing",
+    "comments": "",
+}
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=PERMIT_COLUMNS)
+        writer.writeheader()
+        writer.writerows({**ROW, **row} for row in rows)
+
+
+def parsed_rows(path):
+    return [parse_permit_row(row) for row in columnar_cache.read_rows(path, PERMIT_COLUMNS)]
+
+
+@pytest.mark.parametrize("rows, typed", [
+    # Plain amounts and timestamps are stored typed
+    ([{"declared_valuation": "$1,234.56"}, {"declared_valuation": "42"}, {"declared_valuation": ""}], True),
+    # "1,000" reads as a decimal comma (1.0) and ".5" as 0.5 in parse_float, so those columns stay text
+    ([{"declared_valuation": "$1,234.56"}, {"declared_valuation": "1,000"}], False),
+    ([{"declared_valuation": ".5"}, {"declared_valuation": "7"}], False),
+])
+def test_parquet_rows_parse_like_the_csv(tmp_path, rows, typed):
+    csv_path = str(tmp_path / "permits.csv")
+    write_csv(csv_path, rows)
+    parquet_path = columnar_cache.ensure_columnar_cache(csv_path, PERMIT_FLOAT_COLUMNS, PERMIT_TIMESTAMP_COLUMNS)
+
+    assert parquet_path is not None
+    schema = pq.read_schema(parquet_path)
+    assert (schema.field("declared_valuation").type == pa.float64()) is typed
+    assert pa.types.is_timestamp(schema.field("issued_date").type)
+    assert schema.field("zip").type == pa.string()  # Leading zeros are kept
+    assert parsed_rows(parquet_path) == parsed_rows(csv_path)
+
+
+def test_impossible_dates_stay_text(tmp_path):
+    csv_path = str(tmp_path / "permits.csv")
+    write_csv(csv_path, [{"issued_date": "2023-05-01 00:00:00"}, {"issued_date": "2023-02-30 00:00:00"}])
+    parquet_path = columnar_cache.ensure_columnar_cache(csv_path, PERMIT_FLOAT_COLUMNS, PERMIT_TIMESTAMP_COLUMNS)
+
+    assert pq.read_schema(parquet_path).field("issued_date").type == pa.string()
+    # Handed to parse_date as the same text the CSV has, instead of a rolled-over March date
+    assert [row["issued_date"] for row in columnar_cache.read_rows(parquet_path, PERMIT_COLUMNS)] == [
+        "2023-05-01 00:00:00", "2023-02-30 00:00:00",
+    ]
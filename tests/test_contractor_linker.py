@@ -0,0 +1,59 @@
+import csv
+
+from sqlalchemy import select
+
+from data_importers.boston_importer import PERMIT_COLUMNS, import_csv_to_db_staged
+from data_importers.contractor_linker import link_permits_to_contractors, resolve_applicants
+from database import ApprovedPermit, Contractor, get_session
+
+
+def test_fuzzy_match_ignores_word_order():
+    contractor_keys = {"anthony murphy": 1, "brian kelly": 2}
+    resolved = resolve_applicants({"murphy anthony", "kelly brian", "murphy anthon"}, contractor_keys)
+    assert resolved == {"murphy anthony": 1, "kelly brian": 2, "murphy anthon": 1}
+
+
+def test_fuzzy_match_counts_a_contractor_once_when_name_and_company_tie():
+    # "murphy anthony llc" normalizes to "murphy anthony", which "anthony murphy" matches by word order too
+    contractor_keys = {"anthony murphy": 1, "murphy anthony": 1, "brian kelly": 2}
+    assert resolve_applicants({"anthony murphey"}, contractor_keys) == {"anthony murphey": 1}
+    # A real tie between two contractors stays unlinked
+    assert resolve_applicants({"anthony murphey"}, {"anthony murphy": 1, "murphy anthony": 3}) == {}
+
+
+def write_permits_csv(path, applicants):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=PERMIT_COLUMNS)
+        writer.writeheader()
+        for i, applicant in enumerate(applicants):
+            writer.writerow({
+                "address": f"{i + 1} main st", "city": "boston", "state": "ma", "zip": "02118",
+                "occupancytype": "1-2fam", "y_latitude": "42.35", "x_longitude": "-71.06",
+                "permitnumber": f"alt{i}", "issued_date": "2023-05-01 00:00:00", "declared_valuation": "$1,000.00",
+                "status": "open", "applicant": applicant, "description": "roofing", "comments": "",
+            })
+
+
+def contractor_ids():
+    with get_session() as session:
+        return dict(session.execute(select(ApprovedPermit.permit_id, ApprovedPermit.contractor_id)).all())
+
+
+def test_staged_import_keeps_contractor_links(engine, tmp_path, capsys):
+    with get_session() as session:
+        session.add(Contractor(license_id="1", name="anthony murphy", license_status="active"))
+        session.commit()
+    csv_path = tmp_path / "permits.csv"
+    write_permits_csv(csv_path, ["murphy anthony", "someone else"])
+
+    import_csv_to_db_staged(str(csv_path))
+    link_permits_to_contractors()
+    linked = contractor_ids()
+    assert linked["alt0"] is not None and linked["alt1"] is None
+
+    # Re-importing the same permits swaps in a new table that still carries the links
+    import_csv_to_db_staged(str(csv_path))
+    assert contractor_ids() == linked
+    capsys.readouterr()
+    link_permits_to_contractors()
+    assert "0 rows changed" in capsys.readouterr().out
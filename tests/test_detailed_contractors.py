@@ -0,0 +1,30 @@
+import api
+from benchmarks.api_load_test import seed_database
+
+
+def test_failed_verdicts_only_affect_their_contractor(engine, client, monkeypatch):
+    names = seed_database(engine, 5, 50)
+    calls = []
+
+    async def flaky_gpt_search(prompt):
+        calls.append(prompt)
+        if len(calls) == 2:
+            raise TimeoutError("upstream timed out")
+        return "Test verdict."
+
+    monkeypatch.setattr(api.endpoints, "gpt_search", flaky_gpt_search)
+    params = [("contractor_name", name) for name in names[:3]] + [("gpt", "true")]
+    response = client.get("/api/detailed-contractors", params=params)
+    assert response.status_code == 200
+    results = response.json()["contractors"]
+    assert len(results) == 3
+    failed = [result for result in results if result["gpt"] is None]
+    assert len(failed) == 1 and failed[0]["gpt_error"]
+    for result in results:
+        if result is not failed[0]:
+            assert result["gpt"] == "Test verdict." and "gpt_error" not in result
+
+    # The partial answer isn't cached, so the next request asks again
+    assert "ETag" not in response.headers
+    client.get("/api/detailed-contractors", params=params)
+    assert len(calls) == 6
@@ -0,0 +1,35 @@
+import threading
+
+import pytest
+
+import database
+from database import engine as engine_module
+
+
+def synchronous_setting(engine_ref):
+    with engine_ref.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA synchronous").scalar()
+
+
+def test_database_url_requires_explicit_configuration(monkeypatch, tmp_path):
+    for name in ("DATABASE_URL", "SQL_HOST"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(engine_module, "SQLITE_PATH", None)
+    with pytest.raises(RuntimeError):
+        database.database_url_from_env()
+
+    monkeypatch.setattr(engine_module, "SQLITE_PATH", str(tmp_path / "local.db"))
+    assert database.database_url_from_env() == f"sqlite:///{tmp_path / 'local.db'}"
+
+
+def test_bulk_load_only_affects_the_importing_context(engine):
+    normal, off = 1, 0
+    other_thread = []
+    with database.bulk_load(engine):
+        assert synchronous_setting(engine) == off
+        # e.g. an API request served while the import runs
+        thread = threading.Thread(target=lambda: other_thread.append(synchronous_setting(engine)))
+        thread.start()
+        thread.join()
+    assert other_thread == [normal]
+    assert synchronous_setting(engine) == normal
@@ -0,0 +1,45 @@
+import pytest
+
+import database
+from benchmarks.api_load_test import seed_database
+from data_importers.contractor_linker import link_permits_to_contractors
+from database import fulltext
+
+
+@pytest.fixture(params=["fts5", "like"])
+def search_engine(request, sqlite_url, monkeypatch):
+    """An initialized database, with FTS5 or as on a SQLite build without it."""
+    if request.param == "like":
+        monkeypatch.setattr(fulltext, "_create_fts_table", lambda engine_ref: False)
+    engine_ref = database.create_db_engine(sqlite_url)
+    database.init(engine_ref)
+    seed_database(engine_ref, 5, 200)
+    link_permits_to_contractors()
+    yield engine_ref
+    engine_ref.dispose()
+
+
+def test_search_with_and_without_fts5(search_engine):
+    # Importers refresh the index after loading; without FTS5 that's skipped instead of failing the import
+    database.refresh_fulltext_index()
+    rows = database.search_contractors_by_work("roof")
+    assert rows
+    assert all(row["matching_permits"] > 0 for row in rows)
+    assert database.search_contractors_by_work("zzzz nothing") == []
+
+
+def test_permit_import_completes_without_fts5(sqlite_url, tmp_path, monkeypatch):
+    from data_importers import boston_importer
+    from tests.test_contractor_linker import write_permits_csv
+
+    monkeypatch.setattr(fulltext, "_create_fts_table", lambda engine_ref: False)
+    engine_ref = database.create_db_engine(sqlite_url)
+    database.init(engine_ref)
+    csv_path = tmp_path / "permits.csv"
+    write_permits_csv(csv_path, ["someone"])
+    monkeypatch.setattr(boston_importer, "download_csv", lambda url, path: str(csv_path))
+
+    before = database.get_data_version()
+    boston_importer.update_permits_table_task()
+    assert database.get_data_version() != before
+    engine_ref.dispose()
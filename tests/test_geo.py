@@ -0,0 +1,56 @@
+import asyncio
+
+from api import geo
+from benchmarks.api_load_test import seed_database
+from database import Address, ApprovedPermit, Contractor, get_session, mark_imported
+
+POINT = {"latitude": 42.3, "longitude": -71.1, "radius_m": 2000}
+
+
+def nearby(client):
+    response = client.get("/api/nearby-permits", params=POINT)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_nearby_permits_reflect_an_import_right_away(engine, client):
+    seed_database(engine, 5, 50)
+    before = nearby(client)
+
+    with get_session() as session:
+        contractor = Contractor(license_id="999", name="jozef newcomer", license_status="active")
+        address = Address(street_number="1", street_name="main st", city="boston", state="ma", zipcode="02118",
+                          latitude=POINT["latitude"], longitude=POINT["longitude"])
+        session.add_all([contractor, address])
+        session.flush()
+        session.add_all([
+            ApprovedPermit(permit_id=f"new{i}", project_address_id=address.id, contractor_id=contractor.id,
+                           contractor_name=contractor.name, project_amount=1000)
+            for i in range(3)
+        ])
+        session.commit()
+    mark_imported("boston_permits_update_ts")
+
+    after = nearby(client)
+    assert after["permits_within_radius"] == before["permits_within_radius"] + 3
+    assert after["permits"][0]["distance_m"] == 0
+    assert after["contractors"][0]["name"] == "jozef newcomer"
+    assert after["contractors"][0]["permits_nearby"] == 3
+
+
+def test_grid_rebuild_runs_off_the_event_loop(engine, client, monkeypatch):
+    seed_database(engine, 5, 50)
+    build = geo.permit_grid.build
+    on_event_loop = []
+
+    def recording_build():
+        try:
+            asyncio.get_running_loop()
+            on_event_loop.append(True)
+        except RuntimeError:
+            on_event_loop.append(False)
+        return build()
+
+    monkeypatch.setattr(geo.permit_grid, "build", recording_build)
+    nearby(client)
+    assert on_event_loop == [False]
@@ -0,0 +1,57 @@
+import multiprocessing
+
+from sqlalchemy import text
+
+import database
+from database.db_address import LeaderLease, get_session
+from database.leader_lease import release_lease, try_acquire_lease
+
+CONTENDERS = 8
+
+
+def _contend(url, holder, barrier, results):
+    engine = database.create_db_engine(url)
+    database.db_address.engine = engine
+    database.db_address.session_creator = database.db_address.sessionmaker(bind=engine)
+    barrier.wait()
+    results[holder] = try_acquire_lease("import", holder, ttl=60)
+
+
+def test_only_one_of_many_processes_acquires_the_lease(engine, sqlite_url):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(CONTENDERS)
+    with context.Manager() as manager:
+        results = manager.dict()
+        processes = [
+            context.Process(target=_contend, args=(sqlite_url, f"holder-{i}", barrier, results))
+            for i in range(CONTENDERS)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+            assert process.exitcode == 0
+        results = dict(results)
+
+    winners = [holder for holder, acquired in results.items() if acquired]
+    assert len(results) == CONTENDERS
+    assert len(winners) == 1
+    with get_session() as session:
+        assert session.get(LeaderLease, "import").holder == winners[0]
+
+
+def test_lease_is_renewed_by_holder_and_refused_to_others(engine):
+    assert try_acquire_lease("import", "a", ttl=60)
+    assert try_acquire_lease("import", "a", ttl=60)
+    assert not try_acquire_lease("import", "b", ttl=60)
+
+
+def test_expired_or_released_lease_is_taken_over(engine):
+    assert try_acquire_lease("import", "a", ttl=60)
+    with engine.begin() as conn:
+        # Expired according to the database clock, whatever the local clock says
+        conn.execute(text("UPDATE leader_leases SET expires_at = datetime('now', '-1 seconds')"))
+    assert try_acquire_lease("import", "b", ttl=60)
+
+    release_lease("import", "b")
+    assert try_acquire_lease("import", "c", ttl=60)
@@ -0,0 +1,59 @@
+import asyncio
+import socket
+
+import pytest
+
+from api.llm_gateway import LLMGateway
+from benchmarks.fake_openai import create_app, serve_in_thread
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """Start benchmarks/fake_openai.py in a thread; call with its settings, returns the server's stats."""
+    servers = []
+
+    def start(**settings):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        app = create_app(seed=0, **settings)
+        servers.append(serve_in_thread(app, port))
+        monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{port}/v1")
+        return app.state.stats
+
+    yield start
+    for server in servers:
+        server.should_exit = True
+
+
+def complete_all(gateway, message_lists):
+    async def run():
+        return await asyncio.gather(*(gateway.chat_completion("gpt-4o", messages) for messages in message_lists))
+    return asyncio.run(run())
+
+
+def test_identical_calls_share_one_completion(fake_openai):
+    stats = fake_openai(latency_ms=200)
+    responses = complete_all(LLMGateway(), [[{"role": "user", "content": "Should I hire them?"}]] * 20)
+    assert len(responses) == 20
+    assert len({response.id for response in responses}) == 1
+    assert stats["requests"] == 1
+
+
+def test_concurrency_is_capped(fake_openai):
+    stats = fake_openai(latency_ms=200)
+    responses = complete_all(LLMGateway(max_concurrency=4),
+                             [[{"role": "user", "content": f"Contractor {i}"}] for i in range(12)])
+    assert len({response.id for response in responses}) == 12
+    assert stats["requests"] == 12
+    assert stats["max_concurrent"] == 4
+
+
+def test_rate_limited_calls_are_retried(fake_openai):
+    stats = fake_openai(latency_ms=10, rate_limit_rate=0.5)
+    responses = complete_all(LLMGateway(max_retries=8),
+                             [[{"role": "user", "content": f"Contractor {i}"}] for i in range(10)])
+    assert len(responses) == 10
+    assert stats["rate_limited"] > 0
+    assert stats["completed"] == 10
+    assert stats["requests"] == 10 + stats["rate_limited"]
@@ -0,0 +1,46 @@
+import threading
+import time
+
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine
+
+import metrics
+from database.engine import TimedQueuePool
+
+
+def sample(name):
+    return REGISTRY.get_sample_value(name) or 0
+
+
+def test_pool_metrics_measure_real_waits(sqlite_url):
+    engine_ref = metrics.instrument_engine(
+        create_engine(sqlite_url, poolclass=TimedQueuePool, pool_size=1, max_overflow=0, pool_timeout=5)
+    )
+    saturated = sample("db_pool_saturated_checkouts_total")
+    waits = sample("db_pool_checkout_wait_seconds_count")
+    waited = sample("db_pool_checkout_wait_seconds_sum")
+
+    # One connection reused serially never waits
+    for _ in range(20):
+        with engine_ref.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+    assert sample("db_pool_saturated_checkouts_total") == saturated
+    assert sample("db_pool_checkout_wait_seconds_count") == waits + 20
+
+    # A second checkout while the only connection is held waits until it's returned
+    held = threading.Event()
+
+    def hold_connection():
+        with engine_ref.connect():
+            held.set()
+            time.sleep(0.3)
+
+    thread = threading.Thread(target=hold_connection)
+    thread.start()
+    held.wait()
+    with engine_ref.connect() as conn:
+        conn.exec_driver_sql("SELECT 1")
+    thread.join()
+    assert sample("db_pool_saturated_checkouts_total") == saturated + 1
+    assert sample("db_pool_checkout_wait_seconds_sum") - waited >= 0.2
+    engine_ref.dispose()
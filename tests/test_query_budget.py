@@ -0,0 +1,53 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import metrics
+from benchmarks.api_load_test import seed_database
+from data_importers.contractor_linker import link_permits_to_contractors
+
+# Lookups run a constant number of statements however many permits or contractors are involved: the data
+# version, the contractor(s), their permits with addresses and the total amounts
+DETAILED_CONTRACTOR_MAX_QUERIES = 4
+# Plus the applicant name fallback for permits that aren't linked yet
+DETAILED_CONTRACTOR_UNLINKED_MAX_QUERIES = 6
+DETAILED_CONTRACTORS_MAX_QUERIES = 4
+
+
+@pytest.fixture
+def traced_client(engine, client):
+    metrics.enable_query_tracing(engine)
+    with TestClient(metrics.QueryTraceMiddleware(client.app, mode="header")) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def names(engine):
+    names = seed_database(engine, 20, 400)
+    link_permits_to_contractors()
+    return names
+
+
+def test_detailed_contractor_query_budget(traced_client, names):
+    # names[0] holds most of the permits
+    for name in (names[0], names[-1]):
+        response = metrics.assert_max_queries(traced_client, "/api/detailed-contractor",
+                                              DETAILED_CONTRACTOR_MAX_QUERIES, params={"contractor_name": name})
+        assert response.status_code == 200
+        assert response.json()["previous_works"]
+
+
+def test_detailed_contractor_unlinked_query_budget(engine, traced_client, names):
+    # Permits imported before the first linking pass are found by applicant name
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE approved_permits SET contractor_id = NULL")
+    response = metrics.assert_max_queries(traced_client, "/api/detailed-contractor",
+                                          DETAILED_CONTRACTOR_UNLINKED_MAX_QUERIES, params={"contractor_name": names[0]})
+    assert response.json()["previous_works"]
+
+
+def test_detailed_contractors_query_budget_does_not_grow_with_batch_size(traced_client, names):
+    for batch in (names[:1], names[:10]):
+        params = [("contractor_name", name) for name in batch] + [("gpt", "true")]
+        response = metrics.assert_max_queries(traced_client, "/api/detailed-contractors",
+                                              DETAILED_CONTRACTORS_MAX_QUERIES, params=params)
+        assert len(response.json()["contractors"]) == len(batch)
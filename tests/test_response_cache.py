@@ -0,0 +1,46 @@
+from benchmarks.api_load_test import seed_database
+
+from database import mark_imported
+
+
+def test_if_none_match_star_only_matches_existing_contractors(engine, client):
+    names = seed_database(engine, 5, 50)
+
+    response = client.get("/api/detailed-contractor", params={"contractor_name": "no such contractor"},
+                          headers={"If-None-Match": "*"})
+    assert response.status_code == 404
+
+    # Also when a cached representation exists
+    assert client.get("/api/detailed-contractor", params={"contractor_name": names[0]}).status_code == 200
+    response = client.get("/api/detailed-contractor", params={"contractor_name": names[0]},
+                          headers={"If-None-Match": "*"})
+    assert response.status_code == 304
+
+
+def test_contractor_import_invalidates_etags(engine, client):
+    names = seed_database(engine, 5, 50)
+    params = {"contractor_name": names[0]}
+    etag = client.get("/api/detailed-contractor", params=params).headers["ETag"]
+    assert client.get("/api/detailed-contractor", params=params, headers={"If-None-Match": etag}).status_code == 304
+
+    mark_imported("mass_contractor_update_ts")
+    response = client.get("/api/detailed-contractor", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_if_modified_since_never_hides_errors(engine, client):
+    names = seed_database(engine, 5, 50)
+    mark_imported("boston_permits_update_ts")
+    future = {"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}
+
+    assert client.get("/api/detailed-contractor", params={"contractor_name": "no such contractor"},
+                      headers=future).status_code == 404
+    assert client.get("/api/detailed-contractor", headers=future).status_code == 400
+    assert client.get("/api/nearby-permits", params={"latitude": 42.3, "longitude": -71.1, "radius_m": 10 ** 6},
+                      headers=future).status_code == 400
+
+    # An existing contractor is still not modified, whether computed or served from the cache
+    params = {"contractor_name": names[0]}
+    assert client.get("/api/detailed-contractor", params=params, headers=future).status_code == 304
+    assert client.get("/api/detailed-contractor", params=params, headers=future).status_code == 304